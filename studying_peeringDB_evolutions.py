@@ -1,11 +1,30 @@
 import os
+import sys
 import json
 import pickle
 import re
+import gzip
+import bz2
+import lzma
+import io
+import shutil
+import subprocess
+import argparse
+import inspect
+import functools
+import time
+import threading
+import queue
+import hashlib
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from collections import defaultdict
 from typing import Tuple, Dict
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 import geopandas as gpd
@@ -27,8 +46,18 @@ import pycountry_convert as pc
 ###############################################################################
 
 DATA_DIRECTORY = "/Users/loqmansalamatian/Documents/GitHub/missing-peering-links/data/"
+# A hypergiant list, or a directory of dated lists (YYYY_MM_hypergiants_asns.json) for
+# memberships that change over time (see load_hypergiant_intervals)
 HYPERGIANTS_PATH = "/Users/loqmansalamatian/Documents/GitHub/missing-peering-links/data/hypergiants_list/2021_04_hypergiants_asns.json"
 PEERINGDB_DATA_DIRECTORY = "/Users/loqmansalamatian/Documents/GitHub/missing-peering-links/scripts/data/PeeringDB/"
+# Where the analysis_* functions write their HTML reports
+REPORT_DIRECTORY = "."
+# Time step of the time-series reports: 'M' (monthly), 'Q' or 'Y' rollups (see build_rollups)
+REPORT_FREQUENCY = 'M'
+# Whether the analysis_* functions may open their report in a browser (never in batch mode)
+REPORT_AUTO_OPEN = True
+# Processes rendering the reports in batch mode (None = one per report, up to the CPU count)
+REPORT_WORKERS = None
 # If you only want a subset of hypergiants, uncomment and modify this:
 # else set to None for all available hypergiants
 FOCUS_HYPERGIANTS = None
@@ -37,6 +66,30 @@ FOCUS_HYPERGIANTS = None
 START_YEAR = 2018
 END_YEAR = 2025
 
+# PeeringDB dumps may be stored compressed; they are decompressed on the fly.
+# Extensions are tried in this order when looking up a snapshot.
+PEERINGDB_DUMP_EXTENSIONS = ('.json', '.json.gz', '.json.bz2', '.json.xz', '.json.zst')
+# Number of threads used to decompress .zst dumps (1 = in-process, single threaded)
+DECOMPRESS_THREADS = 1
+
+# Number of months parsed ahead in the background while the current month is aggregated,
+# and an optional cap (in MB) on the memory held by those prefetched months (None = no cap)
+PREFETCH_DEPTH = 2
+PREFETCH_MEMORY_CAP_MB = None
+
+# Which snapshots of the dump directory are processed: 'daily', 'weekly', 'monthly'
+# (first available dump of each month) or 'first-of-month' (only the *_01 dumps)
+SNAPSHOT_CADENCE = 'first-of-month'
+# Skip a snapshot whose file content is identical to the previously selected one
+SKIP_UNCHANGED_SNAPSHOTS = True
+
+# Engine used by process_data and the aggregate stage for the per-snapshot aggregation:
+# 'pandas' or 'polars' (lazy, multithreaded)
+AGGREGATION_BACKEND = 'pandas'
+
+# PeeringDB tables used by the pipeline
+PEERINGDB_TABLES = ('org', 'net', 'fac', 'netfac', 'netixlan')
+
 # Create a mapping of years to colors
 color_map = {
     '2018': 'red',
@@ -107,6 +160,190 @@ def convert_to_Mbps(value: str) -> float:
         print(f"Unrecognized traffic pattern: {value}")
         return None
 
+def find_peeringdb_dump(data_directory_peeringdb: str, year: int, month: int, day: int = 1) -> str:
+    """
+    Return the path of the PeeringDB dump for the given date, whether it is stored
+    as plain JSON or compressed (see PEERINGDB_DUMP_EXTENSIONS).
+    Returns None if no variant of the file exists.
+    """
+    base_name = f"peeringdb_2_dump_{year}_{str(month).zfill(2)}_{str(day).zfill(2)}"
+    for extension in PEERINGDB_DUMP_EXTENSIONS:
+        file_path = os.path.join(data_directory_peeringdb, base_name + extension)
+        if os.path.exists(file_path):
+            return file_path
+    return None
+
+class ProcessOutputStream(io.RawIOBase):
+    """
+    Binary stream over the stdout of a decompression process. Closing it waits for the
+    process and raises CalledProcessError if it failed, so that a truncated or corrupt
+    dump is not silently parsed as whatever output came before the error. A stream closed
+    before the end of the output just stops the process.
+    """
+    def __init__(self, command: list):
+        self.command = command
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.exhausted = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = self.process.stdout.readinto(buffer)
+        self.exhausted = self.exhausted or size == 0
+        return size
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        super().close()
+        if not self.exhausted:
+            self.process.kill()
+        self.process.stdout.close()
+        stderr = self.process.stderr.read()
+        self.process.stderr.close()
+        if self.process.wait() != 0 and self.exhausted:
+            raise subprocess.CalledProcessError(self.process.returncode, self.command, stderr=stderr)
+
+def open_peeringdb_dump(file_path: str, decompress_threads: int = 1):
+    """
+    Open a (possibly compressed) PeeringDB dump as a binary stream, decompressing
+    on the fly so that nothing uncompressed is ever written to disk.
+    For .zst files with `decompress_threads` > 1, decompression is delegated to
+    `pzstd` (parallel zstd) when it is installed.
+    """
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    if file_path.endswith('.bz2'):
+        return bz2.open(file_path, 'rb')
+    if file_path.endswith('.xz'):
+        return lzma.open(file_path, 'rb')
+    if file_path.endswith('.zst'):
+        if decompress_threads > 1 and shutil.which('pzstd'):
+            return ProcessOutputStream(['pzstd', '-d', '-c', '-q', '-p', str(decompress_threads), file_path])
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+    return open(file_path, 'rb')
+
+def load_peeringdb_dump(file_path: str, decompress_threads: int = None) -> dict:
+    """
+    Load a (possibly compressed) PeeringDB dump into a dictionary.
+    """
+    decompress_threads = DECOMPRESS_THREADS if decompress_threads is None else decompress_threads
+    with open_peeringdb_dump(file_path, decompress_threads) as f:
+        return json.load(f)
+
+###############################################################################
+#                       PEERINGDB SNAPSHOT DISCOVERY
+###############################################################################
+
+SNAPSHOT_FILE_PATTERN = re.compile(
+    r'^peeringdb_2_dump_(\d{4})_(\d{2})_(\d{2})(' + '|'.join(re.escape(ext) for ext in PEERINGDB_DUMP_EXTENSIONS) + r')$'
+)
+SNAPSHOT_CADENCES = ('daily', 'weekly', 'monthly', 'first-of-month')
+
+def peeringdb_snapshot_date(file_path: str) -> datetime.date:
+    """
+    Date of a PeeringDB dump, parsed from its file name (see SNAPSHOT_FILE_PATTERN).
+    Returns None if the name is not a dump name or holds a malformed date.
+    """
+    match = SNAPSHOT_FILE_PATTERN.match(os.path.basename(file_path))
+    if not match:
+        return None
+    try:
+        return datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+def scan_peeringdb_snapshots(data_directory_peeringdb: str) -> list:
+    """
+    Scan the dump directory once and return a sorted list of (date, file_path) tuples,
+    one per snapshot date parsed from the file names.
+    If a date exists in several formats, the first in PEERINGDB_DUMP_EXTENSIONS wins.
+    """
+    snapshots = {}
+    with os.scandir(data_directory_peeringdb) as entries:
+        for entry in entries:
+            match = SNAPSHOT_FILE_PATTERN.match(entry.name)
+            if not match or not entry.is_file():
+                continue
+            try:
+                snapshot_date = datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+            except ValueError:
+                continue  # Malformed date in file name
+            rank = PEERINGDB_DUMP_EXTENSIONS.index(match.group(4))
+            if snapshot_date not in snapshots or rank < snapshots[snapshot_date][0]:
+                snapshots[snapshot_date] = (rank, entry.path)
+    return [(snapshot_date, path) for snapshot_date, (rank, path) in sorted(snapshots.items())]
+
+def file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Return the BLAKE2 digest of a file's raw bytes, read in chunks.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def select_snapshots(snapshots: list,
+                     cadence: str = 'first-of-month',
+                     start_date: datetime.date = None,
+                     end_date: datetime.date = None,
+                     skip_unchanged: bool = False) -> list:
+    """
+    Filter a list of (date, file_path) snapshots (as returned by scan_peeringdb_snapshots):
+      - keep those within [start_date, end_date] (both inclusive, None = unbounded)
+      - apply the cadence: 'daily' keeps everything, 'weekly'/'monthly' keep the first
+        available snapshot of each ISO week/month, 'first-of-month' keeps only day 1
+      - if `skip_unchanged`, drop snapshots whose content equals the previously kept one.
+        Files are only hashed when their size matches the previous one, so most
+        snapshots are never read.
+    """
+    if cadence not in SNAPSHOT_CADENCES:
+        raise ValueError(f"Unknown cadence {cadence!r}, expected one of {SNAPSHOT_CADENCES}")
+
+    selected = []
+    seen_periods = set()
+    previous = None  # (size, file_path, digest) of the last kept snapshot
+    for snapshot_date, file_path in snapshots:
+        if start_date and snapshot_date < start_date:
+            continue
+        if end_date and snapshot_date > end_date:
+            continue
+
+        if cadence == 'first-of-month':
+            if snapshot_date.day != 1:
+                continue
+        elif cadence != 'daily':
+            period = snapshot_date.isocalendar()[:2] if cadence == 'weekly' else (snapshot_date.year, snapshot_date.month)
+            if period in seen_periods:
+                continue
+            seen_periods.add(period)
+
+        if skip_unchanged:
+            size = os.path.getsize(file_path)
+            digest = None
+            if previous and previous[0] == size:
+                digest = file_digest(file_path)
+                if previous[2] is None:
+                    previous = (previous[0], previous[1], file_digest(previous[1]))
+                if digest == previous[2]:
+                    continue
+            previous = (size, file_path, digest)
+
+        selected.append((snapshot_date, file_path))
+    return selected
+
+
+def snapshot_key(snapshot_date: datetime.date, cadence: str = 'first-of-month') -> str:
+    """
+    Key used for a snapshot in the results: 'YYYY_MM' for monthly cadences, 'YYYY_MM_DD' otherwise.
+    """
+    if cadence in ('monthly', 'first-of-month'):
+        return snapshot_date.strftime('%Y_%m')
+    return snapshot_date.strftime('%Y_%m_%d')
+
 ###############################################################################
 #                LOADING & PRE-PROCESSING HYPERGIANT AND ASN DATA
 ###############################################################################
@@ -123,16 +360,155 @@ def load_hypergiants(hypergiants_path: str, focus_list: list = None) -> dict:
         hypergiants_dict = {key: hypergiants_dict[key] for key in focus_list if key in hypergiants_dict}
     return hypergiants_dict
 
-def load_country_per_asn(asn_file_path: str) -> dict:
+# Dated hypergiant lists in a directory, e.g. 2021_04_hypergiants_asns.json
+HYPERGIANT_LIST_PATTERN = re.compile(r'^(\d{4})_(\d{2})(?:_(\d{2}))?_hypergiants_asns\.json$')
+# Open bounds of the validity intervals (ISO dates compare correctly as strings)
+INTERVAL_MIN_DATE = '0001-01-01'
+INTERVAL_MAX_DATE = '9999-12-31'
+
+def hypergiant_list_files(hypergiants_path: str) -> list:
+    """
+    Return the sorted (date, file_path) hypergiant lists found at `hypergiants_path`:
+    every dated list of a directory, or a single undated list if it is a file.
+    """
+    if not os.path.isdir(hypergiants_path):
+        return [(None, hypergiants_path)]
+    lists = []
+    for file_name in os.listdir(hypergiants_path):
+        match = HYPERGIANT_LIST_PATTERN.match(file_name)
+        if match:
+            list_date = datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3) or 1))
+            lists.append((list_date, os.path.join(hypergiants_path, file_name)))
+    if not lists:
+        raise FileNotFoundError(f"No *_hypergiants_asns.json list found in {hypergiants_path}")
+    return sorted(lists)
+
+def load_hypergiant_intervals(hypergiants_path: str, focus_list: list = None) -> pd.DataFrame:
+    """
+    Load one or several dated hypergiant lists into an interval index: one row per
+    (asn, hypergiant, validity interval) with columns 'asn' (str), 'hypergiant'
+    (categorical, in order of first appearance), 'valid_from' and 'valid_to' (ISO dates,
+    valid_to exclusive). Each list is valid from its date until the next list's date; the
+    first one also covers everything before it (as the single static list used to) and the
+    last one everything after. Consecutive versions listing the same membership are merged
+    into a single interval. The result is sorted by ASN (see hypergiant_intervals_for_asn).
+    """
+    lists = hypergiant_list_files(hypergiants_path)
+    bounds = [INTERVAL_MIN_DATE] + [list_date.isoformat() for list_date, _ in lists[1:]] + [INTERVAL_MAX_DATE]
+    records = []
+    hypergiant_order = []
+    for version, (_, file_path) in enumerate(lists):
+        for hg_key, hg_data in load_hypergiants(file_path, focus_list).items():
+            if hg_key not in hypergiant_order:
+                hypergiant_order.append(hg_key)
+            records.extend((str(asn), hg_key, version) for asn in hg_data.get('asns', []))
+
+    memberships = pd.DataFrame(records, columns=['asn', 'hypergiant', 'version']).drop_duplicates()
+    memberships = memberships.sort_values(['asn', 'hypergiant', 'version']).reset_index(drop=True)
+    # A new interval starts whenever the (asn, hypergiant) pair changes or a version is skipped
+    same_pair = ((memberships['asn'] == memberships['asn'].shift())
+                 & (memberships['hypergiant'] == memberships['hypergiant'].shift()))
+    consecutive = memberships['version'] == memberships['version'].shift() + 1
+    memberships['interval'] = (~(same_pair & consecutive)).cumsum()
+    intervals = memberships.groupby('interval').agg(
+        asn=('asn', 'first'), hypergiant=('hypergiant', 'first'),
+        first_version=('version', 'min'), last_version=('version', 'max')
+    )
+    bounds = np.array(bounds, dtype=object)
+    intervals = pd.DataFrame({
+        'asn': intervals['asn'].to_numpy(),
+        'hypergiant': pd.Categorical(intervals['hypergiant'], categories=hypergiant_order),
+        'valid_from': bounds[intervals['first_version'].to_numpy()],
+        'valid_to': bounds[intervals['last_version'].to_numpy() + 1],
+    })
+    return intervals.sort_values(['asn', 'valid_from'], kind='stable').reset_index(drop=True)
+
+def hypergiants_for_date(intervals: pd.DataFrame, snapshot_date: datetime.date) -> dict:
+    """
+    Resolve the hypergiant membership valid at `snapshot_date` with one vectorized lookup
+    over the interval index. Returns a dict in the load_hypergiants format:
+    {hypergiant: {'asns': [asn, ...]}}, in the hypergiants' order of first appearance.
+    """
+    iso_date = snapshot_date.isoformat()
+    active = intervals[(intervals['valid_from'] <= iso_date) & (intervals['valid_to'] > iso_date)]
+    return {hg_key: {'asns': group['asn'].tolist()}
+            for hg_key, group in active.groupby('hypergiant', observed=True, sort=True)}
+
+def hypergiant_intervals_for_asn(intervals: pd.DataFrame, asn) -> list:
+    """
+    All (valid_from, valid_to, hypergiant) intervals of an ASN, found by binary search.
+    """
+    asns = intervals['asn'].to_numpy()
+    start, end = np.searchsorted(asns, str(asn), side='left'), np.searchsorted(asns, str(asn), side='right')
+    rows = intervals.iloc[start:end]
+    return list(zip(rows['valid_from'], rows['valid_to'], rows['hypergiant'].astype(str)))
+
+def hypergiant_resolver(hypergiants):
+    """
+    Return a function snapshot_date -> {hypergiant: {'asns': [...]}} for either a static
+    hypergiant dict (load_hypergiants) or an interval index (load_hypergiant_intervals).
+    """
+    if isinstance(hypergiants, pd.DataFrame):
+        return lambda snapshot_date: hypergiants_for_date(hypergiants, snapshot_date)
+    return lambda snapshot_date: hypergiants
+
+def intervals_to_records(intervals: pd.DataFrame) -> dict:
+    """
+    JSON-serializable form of an interval index (see intervals_from_records).
+    """
+    return {'hypergiants': list(intervals['hypergiant'].cat.categories),
+            'intervals': intervals.astype({'hypergiant': str}).to_dict('records')}
+
+def intervals_from_records(records: dict) -> pd.DataFrame:
+    """
+    Rebuild an interval index saved with intervals_to_records.
+    """
+    intervals = pd.DataFrame(records['intervals'], columns=['asn', 'hypergiant', 'valid_from', 'valid_to'])
+    intervals['hypergiant'] = pd.Categorical(intervals['hypergiant'], categories=records['hypergiants'])
+    return intervals
+
+def load_country_per_asn(asn_file_path: str) -> pd.Series:
     """
     Load a mapping of ASN -> country codes from a JSON lines file.
     Expects the file to have lines of the form: {"asn": <asn>, "country": {"iso": <iso2>}, ...}
+    The file is streamed into a compact Series indexed by integer ASN, with categorical
+    country codes, ready to be joined against whole ASN columns (see enrich_asn_country).
     """
-    asn_per_cc = {}
+    asns = []
+    countries = []
     with open(asn_file_path, 'r') as f:
         for line in jsonlines.Reader(f):
-            asn_per_cc[line['asn']] = line['country']['iso']
-    return asn_per_cc
+            asns.append(int(line['asn']))
+            countries.append(line['country']['iso'])
+    asn_per_cc = pd.Series(pd.Categorical(countries), index=pd.Index(np.array(asns, dtype=np.int64), name='asn'),
+                           name='country')
+    # Keep the last entry of an ASN listed twice, as the former dict-based loader did
+    return asn_per_cc[~asn_per_cc.index.duplicated(keep='last')]
+
+def enrich_asn_country(asns: pd.Series, fallback: pd.Series, asn_per_cc: pd.Series) -> pd.Series:
+    """
+    Country of each network: looked up by ASN in `asn_per_cc` (see load_country_per_asn)
+    with a single vectorized join, falling back to `fallback` (e.g. the organization's
+    country) where the ASN is unknown.
+    """
+    asn_codes = pd.to_numeric(asns, errors='coerce').astype('Int64')
+    countries = pd.Series(asn_per_cc.reindex(asn_codes.to_numpy(dtype=np.int64, na_value=-1)).to_numpy(dtype=object),
+                          index=asns.index)
+    return countries.where(countries.notna(), fallback.astype(object))
+
+def country_shares(networks_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Attribute each organization to every country its networks are in ("explode and weight").
+    Expects one row per network with 'name_org', 'country' and 'info_traffic' (Mbps).
+    Returns one row per (name_org, country) with the share of the organization's networks
+    located there ('weight') and its traffic weighted by that share ('info_traffic').
+    """
+    networks_df = networks_df.dropna(subset=['country'])
+    per_country = networks_df.groupby(['name_org', 'country'], observed=True).size().rename('networks').reset_index()
+    per_country['weight'] = per_country['networks'] / per_country.groupby('name_org')['networks'].transform('sum')
+    org_traffic = networks_df.groupby('name_org')['info_traffic'].sum()
+    per_country['info_traffic'] = per_country['name_org'].map(org_traffic) * per_country['weight']
+    return per_country
 
 ###############################################################################
 #                  STUDYING WHO ARE THE CDNs OVER TIME (MAPPING)
@@ -150,12 +526,16 @@ def study_cdn_evolution(start_year: int,
                         end_year: int,
                         hypergiants_dict: dict,
                         peeringdb_data_directory: str,
-                        data_directory: str) -> Tuple[Dict, Dict]:
+                        data_directory: str,
+                        info_type: str = 'Content') -> Tuple[Dict, Dict]:
     """
     Study CDNs over the specified date range. Generates:
       1. cdn_per_country_per_year: Number of CDN orgs per country (by month)
       2. cdn_traffic_per_country_per_year: Sum of 'info_traffic' per country (by month)
 
+    Only networks whose `info_type` matches are counted; pass None to include all networks.
+    Organizations present in several countries count in each of them, with their traffic
+    split by the share of their networks in each country (see country_shares).
     Saves an animated GIF visualizing the evolution of traffic volumes across countries.
     Returns the above two dictionaries.
     """
@@ -168,57 +548,46 @@ def study_cdn_evolution(start_year: int,
     asn_per_cc = load_country_per_asn(os.path.join(os.path.dirname(data_directory),
                                                    "BGP_data",
                                                    "ASNS-2023-05-12.json"))
-    for year in tqdm(range(start_year, end_year + 1), desc="CDN Evolution by Year"):
-        for month in range(1, 13):
-            month_str = str(month).zfill(2)
-            year_str = str(year)
-            file_name = f"peeringdb_2_dump_{year_str}_{month_str}_01.json"
-            file_path = os.path.join(peeringdb_data_directory, file_name)
-
-            if not os.path.exists(file_path):
-                continue  # Skip if file not present
-
-            # Load the monthly data
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-
-            org_df = pd.DataFrame.from_dict(data['org']['data']).rename(columns={'id': 'org_id'})
-            net_df = pd.DataFrame.from_dict(data['net']['data']).rename(columns={'id': 'net_id'})
-            merged_df = pd.merge(net_df, org_df, on='org_id', how='inner', suffixes=('_net', '_org'))
-
-            # Filter "Content" only
-            content_df = merged_df[merged_df['info_type'] == 'Content'].copy()
-
-            # Convert traffic to Mbps
-            content_df['info_traffic'] = content_df['info_traffic'].apply(convert_to_Mbps)
-
-            # Convert ASN to standard string & map country
-            content_df['asn'] = content_df['asn'].astype(str)
-            content_df['country'] = content_df['country'].apply(
-                lambda x: asn_per_cc[x] if x in asn_per_cc.keys() and x is not None else x
-            )
-
-            # Aggregate by org name
-            aggregated = content_df.groupby('name_org').agg({
-                'info_traffic': 'sum',
-                'asn': 'count',
-                'country': lambda x: set(x)
-            }).reset_index()
-
-            # Flatten the set of countries if there's exactly one
-            aggregated['country'] = aggregated['country'].apply(
-                lambda x: list(x)[0] if len(x) == 1 else list(x)
-            )
-
-            date_key = f"{year_str}-{month_str}"
-            cdn_per_country_per_year[date_key] = {}
-            cdn_traffic_per_country_per_year[date_key] = {}
-
-            for country, group_df in aggregated.groupby('country'):
-                if not country or pd.isna(country):
-                    continue
-                cdn_per_country_per_year[date_key][country] = group_df.shape[0]
-                cdn_traffic_per_country_per_year[date_key][country] = group_df['info_traffic'].sum()
+    snapshots = select_snapshots(scan_peeringdb_snapshots(peeringdb_data_directory),
+                                 cadence='first-of-month',
+                                 start_date=datetime.date(start_year, 1, 1),
+                                 end_date=datetime.date(end_year, 12, 31))
+    for snapshot_date, file_path in tqdm(snapshots, desc="CDN Evolution by Month"):
+        month_str = str(snapshot_date.month).zfill(2)
+        year_str = str(snapshot_date.year)
+
+        # Load the monthly data
+        data = load_peeringdb_dump(file_path)
+
+        org_df = pd.DataFrame.from_dict(data['org']['data']).rename(columns={'id': 'org_id'})
+        net_df = pd.DataFrame.from_dict(data['net']['data']).rename(columns={'id': 'net_id'})
+        merged_df = pd.merge(net_df, org_df, on='org_id', how='inner', suffixes=('_net', '_org'))
+
+        # Filter "Content" only (or the requested network type)
+        if info_type is None:
+            content_df = merged_df.copy()
+        else:
+            content_df = merged_df[merged_df['info_type'] == info_type].copy()
+
+        # Convert traffic to Mbps (parsing each distinct traffic label once)
+        traffic_labels = content_df['info_traffic'].dropna().unique()
+        content_df['info_traffic'] = content_df['info_traffic'].map(
+            {label: convert_to_Mbps(label) for label in traffic_labels}
+        ).astype(float)
+
+        # Convert ASN to standard string & map country (ASN country first, organization country otherwise)
+        content_df['country'] = enrich_asn_country(content_df['asn'], content_df['country'], asn_per_cc)
+        content_df['asn'] = content_df['asn'].astype(str)
+
+        # Attribute each organization to all the countries of its networks
+        aggregated = country_shares(content_df)
+
+        date_key = f"{year_str}-{month_str}"
+        per_country = aggregated[aggregated['country'] != ''].groupby('country').agg(
+            orgs=('name_org', 'nunique'), info_traffic=('info_traffic', 'sum')
+        )
+        cdn_per_country_per_year[date_key] = per_country['orgs'].to_dict()
+        cdn_traffic_per_country_per_year[date_key] = per_country['info_traffic'].to_dict()
 
     # -------------- Create and save an animated world map of traffic volumes --------------
 
@@ -277,7 +646,8 @@ def process_hypergiant(hg_df: pd.DataFrame,
                        hypergiant_key: str,
                        year_str: str,
                        month_str: str,
-                       final_dicts: dict) -> None:
+                       final_dicts: dict,
+                       day_str: str = None) -> None:
     """
     Process a single hypergiant's monthly DataFrame, and update final_dicts with:
       - Facilities
@@ -287,8 +657,9 @@ def process_hypergiant(hg_df: pd.DataFrame,
       - IXPs
       - First/Last appearance of certain facilities
       - ASNs connected to each facility
+    Results are keyed by 'YYYY_MM', or 'YYYY_MM_DD' when `day_str` is given.
     """
-    yymm_str = f"{year_str}_{month_str}"
+    yymm_str = f"{year_str}_{month_str}" if day_str is None else f"{year_str}_{month_str}_{day_str}"
 
     # Count unique facilities
     fac_count = hg_df['name_fac'].nunique()
@@ -327,18 +698,36 @@ def process_hypergiant(hg_df: pd.DataFrame,
     asns_in_infra = hg_df.groupby('name_fac')['local_asn'].apply(lambda x: x.unique().tolist()).to_dict()
     final_dicts['ases_in_new_infra'].setdefault(hypergiant_key, {})[yymm_str] = asns_in_infra
 
+    # Track first appearance/disappearance of each city (with the first facility seen there)
+    first_rows = hg_df.dropna(subset=['city_netfac']).drop_duplicates('city_netfac')
+    track_city_appearances(final_dicts, hypergiant_key, yymm_str,
+                           dict(zip(first_rows['city_netfac'], first_rows['name_fac'])))
+
+    # Log what changed since the hypergiant's previous snapshot
+    port_capacities = unique_speeds.explode().groupby(level=['name_netixlan', 'ipaddr4']).sum().to_dict()
+    track_footprint_changes(final_dicts, hypergiant_key, yymm_str,
+                            hypergiant_footprint(fac_list, final_dicts['cities_specific'][hypergiant_key][yymm_str],
+                                                 final_dicts['countries_specific'][hypergiant_key][yymm_str],
+                                                 port_capacities))
+
+def track_city_appearances(final_dicts: dict,
+                           hypergiant_key: str,
+                           yymm_str: str,
+                           city_first_facility: dict) -> None:
+    """
+    Update final_dicts['first_appearance'] and final_dicts['first_disappearance'] for one
+    hypergiant and snapshot. `city_first_facility` maps each city seen in the snapshot (in
+    order of appearance) to the first facility listed for it.
+    """
     # Track first appearance of each city (or facility) over time
-    for city in hg_df['city_netfac'].dropna().unique():
+    for city, facility_name in city_first_facility.items():
         if city not in final_dicts['first_appearance'].setdefault(hypergiant_key, {}):
             # Record the facility name for that city and time
-            city_subset = hg_df[hg_df['city_netfac'] == city]
-            if not city_subset.empty:
-                facility_name = city_subset.iloc[0]['name_fac']
-                final_dicts['first_appearance'][hypergiant_key][city] = (facility_name, yymm_str)
+            final_dicts['first_appearance'][hypergiant_key][city] = (facility_name, yymm_str)
 
     # Track disappearance if a city was seen before but not in current set
     previously_seen = set(final_dicts['first_appearance'].get(hypergiant_key, {}).keys())
-    currently_seen = set(hg_df['city_netfac'].dropna().unique())
+    currently_seen = set(city_first_facility)
     disappeared = previously_seen - currently_seen
     for city in disappeared:
         # Only record the first time it disappears if not yet tracked
@@ -346,29 +735,197 @@ def process_hypergiant(hg_df: pd.DataFrame,
         if city not in final_dicts['first_disappearance'][hypergiant_key]:
             final_dicts['first_disappearance'][hypergiant_key][city] = yymm_str
 
-def parse_peeringdb_month(year: int, month: int, data_directory_peeringdb: str) -> dict:
+# Entity types of the change-event stream (IXPs and ports also carry their capacity)
+FOOTPRINT_ENTITIES = ('facility', 'city', 'country', 'IXP', 'port')
+# Fields of a change event; 'change' is one of 'added', 'removed' or 'capacity_changed'
+CHANGE_EVENT_FIELDS = ('hypergiant', 'month', 'entity_type', 'change', 'entity', 'old', 'new')
+
+def hypergiant_footprint(facilities: list, cities: list, countries: list, port_capacities: dict) -> dict:
+    """
+    Footprint of a hypergiant in one snapshot, compared month over month by
+    track_footprint_changes: for each entity type of FOOTPRINT_ENTITIES, the sorted entity
+    names and, for IXPs and ports, their capacity. `port_capacities` maps each port, an
+    (IXP, IP address) pair, to the sum of its distinct speeds; ports are named 'ip@ixp' and
+    the capacity of an IXP is the sum over its ports, as in capacities_ixp.
+    """
+    ixp_capacities = defaultdict(float)
+    for (ixp, _), capacity in port_capacities.items():
+        ixp_capacities[ixp] += capacity
+    return {
+        'facility': footprint_arrays(facilities),
+        'city': footprint_arrays(cities),
+        'country': footprint_arrays(countries),
+        'IXP': footprint_arrays(list(ixp_capacities), list(ixp_capacities.values())),
+        'port': footprint_arrays([f"{ipaddr4}@{ixp}" for ixp, ipaddr4 in port_capacities],
+                                 list(port_capacities.values())),
+    }
+
+def footprint_arrays(names, values=None) -> tuple:
+    """
+    (names, values) of one entity type of a footprint as arrays sorted by name; values
+    (capacities) are None for entity types without one.
+    """
+    names = np.asarray(names, dtype=str)
+    order = np.argsort(names, kind='stable')
+    if values is None:
+        return names[order], None
+    return names[order], np.asarray(values, dtype=float)[order]
+
+def footprint_changes(old: dict, new: dict) -> list:
+    """
+    (entity_type, change, entity, old_value, new_value) changes from footprint `old` to
+    footprint `new`, computed with set differences of their sorted name arrays. Added and
+    removed entities carry their capacity (if any) as new/old value; entities present in
+    both whose capacity differs are reported as 'capacity_changed'.
+    """
+    changes = []
+    for entity_type in FOOTPRINT_ENTITIES:
+        old_names, old_values = old.get(entity_type, ((), None))
+        new_names, new_values = new.get(entity_type, ((), None))
+        has_values = old_values is not None or new_values is not None
+        old_names, new_names = np.asarray(old_names, dtype=str), np.asarray(new_names, dtype=str)
+        old_values = np.asarray(old_values if old_values is not None else np.zeros(len(old_names)), dtype=float)
+        new_values = np.asarray(new_values if new_values is not None else np.zeros(len(new_names)), dtype=float)
+
+        added = np.isin(new_names, old_names, assume_unique=True, invert=True)
+        removed = np.isin(old_names, new_names, assume_unique=True, invert=True)
+        changes.extend((entity_type, 'removed', name, value if has_values else None, None)
+                       for name, value in zip(old_names[removed].tolist(), old_values[removed].tolist()))
+        changes.extend((entity_type, 'added', name, None, value if has_values else None)
+                       for name, value in zip(new_names[added].tolist(), new_values[added].tolist()))
+        if has_values:
+            _, old_index, new_index = np.intersect1d(old_names, new_names, assume_unique=True, return_indices=True)
+            changed = old_values[old_index] != new_values[new_index]
+            changes.extend((entity_type, 'capacity_changed', name, old_value, new_value)
+                           for name, old_value, new_value in zip(new_names[new_index[changed]].tolist(),
+                                                                 old_values[old_index[changed]].tolist(),
+                                                                 new_values[new_index[changed]].tolist()))
+    return changes
+
+def track_footprint_changes(final_dicts: dict,
+                            hypergiant_key: str,
+                            yymm_str: str,
+                            footprint: dict) -> None:
+    """
+    Append to final_dicts['events'] the changes of a hypergiant's footprint since the last
+    snapshot it was seen in (everything is 'added' the first time), as
+    (hypergiant, month, entity_type, change, entity, old_value, new_value) tuples (see
+    CHANGE_EVENT_FIELDS), and keep the footprint for the next snapshot in final_dicts['footprints'].
+    """
+    previous = final_dicts['footprints'].get(hypergiant_key, {})
+    final_dicts['events'].extend((hypergiant_key, yymm_str) + change for change in footprint_changes(previous, footprint))
+    final_dicts['footprints'][hypergiant_key] = footprint
+
+def close_footprint(final_dicts: dict, hypergiant_key: str, yymm_str: str) -> None:
+    """
+    A hypergiant seen before is absent from this snapshot (no rows, or no longer listed):
+    record the removal of its whole footprint and forget it, so that it is reported as
+    'added' again if it comes back.
+    """
+    if hypergiant_key in final_dicts['footprints']:
+        track_footprint_changes(final_dicts, hypergiant_key, yymm_str, {})
+        del final_dicts['footprints'][hypergiant_key]
+
+def close_unlisted_footprints(final_dicts: dict, yymm_str: str, listed) -> None:
+    """
+    close_footprint every hypergiant with a footprint that is not in `listed`, by name.
+    """
+    for hg_key in sorted(set(final_dicts['footprints']) - set(listed)):
+        close_footprint(final_dicts, hg_key, yymm_str)
+
+def replay_change_events(events: list, until: str = None) -> dict:
+    """
+    Rebuild the footprint of every hypergiant from a change-event stream, considering the
+    events of the snapshots strictly before `until` (all of them if None).
+    Returns {hypergiant: footprint} (see hypergiant_footprint), without the hypergiants
+    whose footprint was entirely removed (see close_footprint).
+    """
+    states = {}
+    for hg_key, yymm_str, entity_type, change, entity, _, new_value in events:
+        if until is not None and yymm_str >= until:
+            continue
+        entities = states.setdefault(hg_key, {}).setdefault(entity_type, {})
+        if change == 'removed':
+            del entities[entity]
+        else:
+            entities[entity] = new_value
+    footprints = {}
+    for hg_key, entity_types in states.items():
+        if not any(entity_types.values()):
+            continue
+        footprints[hg_key] = {}
+        for entity_type in FOOTPRINT_ENTITIES:
+            entities = entity_types.get(entity_type, {})
+            with_values = entity_type in ('IXP', 'port')
+            footprints[hg_key][entity_type] = footprint_arrays(list(entities),
+                                                               list(entities.values()) if with_values else None)
+    return footprints
+
+def save_change_events(events: list, file_path: str) -> None:
+    """
+    Save a change-event stream as JSON lines, one event (see CHANGE_EVENT_FIELDS) per line.
+    """
+    with jsonlines.open(file_path, mode='w', dumps=lambda obj: json.dumps(obj, cls=NpEncoder)) as writer:
+        writer.write_all(dict(zip(CHANGE_EVENT_FIELDS, event)) for event in events)
+
+def load_change_events(file_path: str, hypergiant: str = None, entity_type: str = None) -> list:
+    """
+    Load the events saved with save_change_events as tuples, optionally only those of one
+    hypergiant and/or entity type.
+    """
+    events = []
+    with jsonlines.open(file_path) as reader:
+        for event in reader:
+            if hypergiant is not None and event['hypergiant'] != hypergiant:
+                continue
+            if entity_type is not None and event['entity_type'] != entity_type:
+                continue
+            events.append(tuple(event[field] for field in CHANGE_EVENT_FIELDS))
+    return events
+
+def parse_peeringdb_month(year: int, month: int, data_directory_peeringdb: str,
+                          decompress_threads: int = None) -> dict:
     """
     Given a year and month, parse the corresponding PeeringDB JSON into
     merged data structures (org, network, netfac, netixlan, fac).
+    The dump may be plain or compressed (.gz, .bz2, .xz, .zst).
     Returns a dict of DataFrames if the file is found, else None.
     """
     month_str = str(month).zfill(2)
-    file_name = f"peeringdb_2_dump_{year}_{month_str}_01.json"
-    file_path = os.path.join(data_directory_peeringdb, file_name)
+    file_path = find_peeringdb_dump(data_directory_peeringdb, year, month)
 
-    if not os.path.exists(file_path):
-        print(f"[WARN] {file_name} does not exist. Skipping.")
+    if file_path is None:
+        print(f"[WARN] peeringdb_2_dump_{year}_{month_str}_01.json does not exist. Skipping.")
         return None
 
-    with open(file_path, 'r') as f:
-        data = json.load(f)
+    return parse_peeringdb_dump(file_path, decompress_threads)
+
+def parse_peeringdb_dump(file_path: str, decompress_threads: int = None) -> dict:
+    """
+    Parse a single PeeringDB dump file into merged data structures
+    (org, network, netfac, netixlan, fac). Returns a dict of DataFrames.
+    Rows are ordered by 'id' before merging, as in the snapshot store, so that the
+    per-snapshot lists come out in the same order whichever path built them.
+    """
+    data = load_peeringdb_dump(file_path, decompress_threads)
+    return merge_peeringdb_tables({table: pd.DataFrame(data[table]['data']).sort_values('id', kind='stable')
+                                   .reset_index(drop=True) for table in PEERINGDB_TABLES})
 
+def merge_peeringdb_tables(tables: dict, net_ids=None) -> dict:
+    """
+    Merge raw PeeringDB tables (DataFrames keyed by table name, with their original 'id'
+    columns) into the structures returned by parse_peeringdb_month.
+    If `net_ids` is given, only those networks are kept before merging.
+    """
     # Convert to DataFrame
-    org_df = pd.DataFrame(data['org']['data']).rename(columns={'id': 'org_id'})
-    net_df = pd.DataFrame(data['net']['data']).rename(columns={'id': 'net_id'})
-    netfac_df = pd.DataFrame(data['netfac']['data']).rename(columns={'id': 'netfac_id'})
-    netixlan_df = pd.DataFrame(data['netixlan']['data']).rename(columns={'id': 'netixlan_id'})
-    fac_df = pd.DataFrame(data['fac']['data']).rename(columns={'id': 'fac_id'})
+    org_df = tables['org'].rename(columns={'id': 'org_id'})
+    net_df = tables['net'].rename(columns={'id': 'net_id'})
+    netfac_df = tables['netfac'].rename(columns={'id': 'netfac_id'})
+    netixlan_df = tables['netixlan'].rename(columns={'id': 'netixlan_id'})
+    fac_df = tables['fac'].rename(columns={'id': 'fac_id'})
+
+    if net_ids is not None:
+        net_df = net_df[net_df['net_id'].isin(net_ids)]
 
     # Merge them
     merged_org = pd.merge(net_df, org_df, on='org_id', how='inner', suffixes=('_net', '_org'))
@@ -387,19 +944,106 @@ def parse_peeringdb_month(year: int, month: int, data_directory_peeringdb: str)
         'merged': merged_org
     }
 
-def process_data(start_year: int,
-                 end_year: int,
-                 hypergiants_dict: dict,
-                 peeringdb_directory: str) -> dict:
+def parsed_month_size(parsed: dict, sample: int = 1000) -> int:
     """
-    Main driver function to process PeeringDB data for the specified range of years/months.
-    Builds a comprehensive dictionary with:
-        'capacities', 'cities', 'countries', 'fac_count', 'fac',
-        'cities_specific', 'countries_specific', 'first_appearance',
-        'ases_in_new_infra', 'first_disappearance'
+    Approximate the memory footprint (in bytes) of the DataFrames returned by parse_peeringdb_month.
+    Object (string) columns are estimated from the mean size of `sample` evenly spaced
+    values rather than by walking every cell, which would cost more than the parsing itself
+    on the all-networks merged frame.
     """
-    # Initialize final dictionaries
-    final_dicts = {
+    if not parsed:
+        return 0
+    size = 0
+    for df in parsed.values():
+        if hasattr(df, 'estimated_size'):
+            size += df.estimated_size()
+            continue
+        size += df.memory_usage(index=True, deep=False).sum()
+        if len(df):
+            rows = df.iloc[np.linspace(0, len(df) - 1, min(sample, len(df))).astype(int)]
+            # Columns holding Python objects (Arrow-backed strings are already counted)
+            for column, dtype in df.dtypes.items():
+                if dtype == object or getattr(dtype, 'storage', None) == 'python':
+                    size += rows[column].map(sys.getsizeof).mean() * len(df)
+    return int(size)
+
+def prefetch_peeringdb_snapshots(snapshots: list,
+                                 prefetch_depth: int = None,
+                                 memory_cap_mb: float = None,
+                                 parser=None):
+    """
+    Generator yielding (date, parsed) for each (date, file_path) in `snapshots`, in order,
+    where parsed = parser(file_path) (parse_peeringdb_dump by default).
+    A background thread reads and decodes up to `prefetch_depth` snapshots ahead of the
+    consumer, so that disk/network reads overlap with the per-snapshot aggregation.
+    If `memory_cap_mb` is set, the reader also waits while the snapshots already queued
+    exceed that size (at least one snapshot is always allowed in flight).
+    """
+    prefetch_depth = PREFETCH_DEPTH if prefetch_depth is None else prefetch_depth
+    memory_cap_mb = PREFETCH_MEMORY_CAP_MB if memory_cap_mb is None else memory_cap_mb
+    parser = parser or parse_peeringdb_dump
+    if prefetch_depth < 1:
+        for snapshot_date, file_path in snapshots:
+            yield snapshot_date, parser(file_path)
+        return
+
+    memory_cap = memory_cap_mb * 1024 * 1024 if memory_cap_mb else None
+    buffered = queue.Queue(maxsize=prefetch_depth)
+    memory_lock = threading.Condition()
+    in_flight = {'bytes': 0}
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for snapshot_date, file_path in snapshots:
+                if stop.is_set():
+                    return
+                parsed = parser(file_path)
+                # Only measured when there is a cap to enforce
+                size = parsed_month_size(parsed) if memory_cap else 0
+                with memory_lock:
+                    while memory_cap and in_flight['bytes'] > 0 and in_flight['bytes'] + size > memory_cap \
+                            and not stop.is_set():
+                        memory_lock.wait()
+                    in_flight['bytes'] += size
+                buffered.put((snapshot_date, parsed, size))
+        except Exception as e:
+            buffered.put(e)
+            return
+        buffered.put(None)
+
+    reader = threading.Thread(target=producer, name="peeringdb-prefetch", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = buffered.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            snapshot_date, parsed, size = item
+            with memory_lock:
+                in_flight['bytes'] -= size
+                memory_lock.notify_all()
+            yield snapshot_date, parsed
+    finally:
+        # Unblock the reader if the consumer stops early
+        stop.set()
+        with memory_lock:
+            memory_lock.notify_all()
+        while reader.is_alive():
+            try:
+                buffered.get_nowait()
+            except queue.Empty:
+                reader.join(timeout=0.1)
+
+def init_final_dicts() -> dict:
+    """
+    Return the empty result structure filled by process_hypergiant.
+    'events' is the month-over-month change-event stream and 'footprints' the latest footprint
+    of each hypergiant it is computed from (see track_footprint_changes).
+    """
+    return {
         'capacities': {},
         'capacities_ixp': {},
         'cities': {},
@@ -411,31 +1055,1309 @@ def process_data(start_year: int,
         'countries_specific': {},
         'first_appearance': {},
         'ases_in_new_infra': {},
-        'first_disappearance': {}
+        'first_disappearance': {},
+        'events': [],
+        'footprints': {}
     }
 
-    for year in tqdm(range(start_year, end_year + 1), desc="Processing Data by Year"):
-        for month in range(1, 13):
-            # Parse the monthly file
-            parsed = parse_peeringdb_month(year, month, PEERINGDB_DATA_DIRECTORY)
-            if not parsed:
-                continue  # Skip if file missing
-
+def process_data(start_year: int,
+                 end_year: int,
+                 hypergiants_dict: dict,
+                 peeringdb_directory: str,
+                 cadence: str = None,
+                 backend: str = None) -> dict:
+    """
+    Main driver function to process PeeringDB data for the specified range of years.
+    Snapshots are discovered with a single directory scan and selected according to
+    `cadence` (defaults to SNAPSHOT_CADENCE); see select_snapshots.
+    `backend` selects the aggregation engine (defaults to AGGREGATION_BACKEND).
+    `hypergiants_dict` is either a static hypergiant dict (load_hypergiants) or an interval
+    index (load_hypergiant_intervals), resolved to the membership valid at each snapshot.
+    Builds a comprehensive dictionary with:
+        'capacities', 'cities', 'countries', 'fac_count', 'fac',
+        'cities_specific', 'countries_specific', 'first_appearance',
+        'ases_in_new_infra', 'first_disappearance'
+    """
+    # Initialize final dictionaries
+    final_dicts = init_final_dicts()
+
+    cadence = cadence or SNAPSHOT_CADENCE
+    snapshots = select_snapshots(scan_peeringdb_snapshots(peeringdb_directory),
+                                 cadence=cadence,
+                                 start_date=datetime.date(start_year, 1, 1),
+                                 end_date=datetime.date(end_year, 12, 31),
+                                 skip_unchanged=SKIP_UNCHANGED_SNAPSHOTS)
+    by_day = cadence not in ('monthly', 'first-of-month')
+    backend = backend or AGGREGATION_BACKEND
+    parser = load_polars_tables if backend == 'polars' else parse_peeringdb_dump
+    resolve_hypergiants = hypergiant_resolver(hypergiants_dict)
+
+    # Snapshots are parsed in a background thread while the previous one is aggregated
+    for snapshot_date, parsed in tqdm(prefetch_peeringdb_snapshots(snapshots, parser=parser),
+                                      total=len(snapshots), desc="Processing Snapshots"):
+        hypergiants_at = resolve_hypergiants(snapshot_date)
+        if backend == 'polars':
+            process_snapshot_polars(parsed, hypergiants_at, str(snapshot_date.year), str(snapshot_date.month).zfill(2),
+                                    final_dicts, day_str=str(snapshot_date.day).zfill(2) if by_day else None)
+        else:
             merged_df = parsed['merged']
 
             # Process for each hypergiant
-            for hg_key, hg_data in hypergiants_dict.items():
-                if year == 2021 and hg_key == 'akamai' and (month == 12):
-                    print('Zoom in')
+            for hg_key, hg_data in hypergiants_at.items():
                 asn_list = hg_data.get('asns', [])
                 # Subset to hypergiant’s rows
                 hg_subset = merged_df[merged_df['asn'].isin(asn_list)]
                 if hg_subset.empty:
+                    close_footprint(final_dicts, hg_key, snapshot_key(snapshot_date, cadence))
+                    continue
+                process_hypergiant(hg_subset, hg_key, str(snapshot_date.year), str(snapshot_date.month).zfill(2),
+                                   final_dicts, day_str=str(snapshot_date.day).zfill(2) if by_day else None)
+        # Hypergiants dropped from the (dated) hypergiant list
+        close_unlisted_footprints(final_dicts, snapshot_key(snapshot_date, cadence), hypergiants_at)
+
+    return final_dicts
+
+###############################################################################
+#                  POLARS (LAZY) AGGREGATION BACKEND
+###############################################################################
+
+# Columns of each table actually used by the aggregation; everything else is never materialized
+POLARS_TABLE_COLUMNS = {
+    'org': ['id'],
+    'net': ['id', 'org_id', 'asn'],
+    'fac': ['id', 'name'],
+    'netfac': ['net_id', 'fac_id', 'local_asn', 'city', 'country'],
+    'netixlan': ['net_id', 'name', 'speed', 'ipaddr4'],
+}
+
+def load_polars_tables(file_path: str) -> dict:
+    """
+    Load the columns of a PeeringDB dump needed by the Polars backend (see
+    POLARS_TABLE_COLUMNS) into Polars DataFrames, ordered by 'id' like parse_peeringdb_dump.
+    """
+    import polars as pl
+    data = load_peeringdb_dump(file_path)
+    tables = {}
+    for table, columns in POLARS_TABLE_COLUMNS.items():
+        rows = sorted(data[table]['data'], key=lambda row: row['id'])
+        tables[table] = pl.DataFrame({column: [row.get(column) for row in rows] for column in columns},
+                                     strict=False)
+    return tables
+
+def polars_tables_from_pandas(tables: dict, net_ids=None) -> dict:
+    """
+    Polars tables as returned by load_polars_tables, from raw pandas PeeringDB tables (e.g.
+    a snapshot store's), optionally restricted to the networks `net_ids`.
+    """
+    import polars as pl
+    tables = dict(tables)
+    if net_ids is not None:
+        tables['net'] = tables['net'][tables['net']['id'].isin(net_ids)]
+        for table in ('netfac', 'netixlan'):
+            tables[table] = tables[table][tables[table]['net_id'].isin(net_ids)]
+    polars_tables = {}
+    for table, columns in POLARS_TABLE_COLUMNS.items():
+        df = tables[table]
+        # Missing values back to None, as in the dump, so both loaders give the same frames
+        polars_tables[table] = pl.DataFrame(
+            {column: (df[column].astype(object).where(df[column].notna(), None).tolist()
+                      if column in df.columns else [None] * len(df)) for column in columns},
+            # Typed join keys, also when the restriction leaves a table empty
+            schema_overrides={column: pl.Int64 for column in columns if column in ('id', 'org_id', 'net_id', 'fac_id')},
+            strict=False
+        )
+    return polars_tables
+
+def hypergiant_merged_lazy(tables: dict, hypergiants_dict: dict):
+    """
+    Lazy query plan of the merge_peeringdb_tables join restricted to hypergiant networks,
+    with a 'hypergiant' column. Networks are tagged (and filtered) before the fan-out
+    joins, and row order follows the pandas merge so that per-snapshot lists match.
+    """
+    import polars as pl
+    hypergiant_asns = pl.LazyFrame(
+        [(hg_key, str(asn)) for hg_key, hg_data in hypergiants_dict.items() for asn in hg_data.get('asns', [])],
+        schema={'hypergiant': pl.String, 'asn': pl.String}, orient='row'
+    )
+    net = tables['net'].lazy().rename({'id': 'net_id'}).with_columns(pl.col('asn').cast(pl.String))
+    org = tables['org'].lazy().rename({'id': 'org_id'})
+    netfac = tables['netfac'].lazy().rename({'city': 'city_netfac', 'country': 'country_netfac'})
+    netixlan = tables['netixlan'].lazy().rename({'name': 'name_netixlan'})
+    fac = tables['fac'].lazy().rename({'id': 'fac_id', 'name': 'name_fac'})
+
+    return (
+        net.join(org, on='org_id', how='inner', maintain_order='left')
+        .join(hypergiant_asns, on='asn', how='inner', maintain_order='left')
+        .join(netfac, on='net_id', how='inner', maintain_order='left')
+        .join(netixlan, on='net_id', how='inner', maintain_order='left')
+        .join(fac, on='fac_id', how='inner', maintain_order='left')
+    )
+
+def process_snapshot_polars(tables: dict,
+                            hypergiants_dict: dict,
+                            year_str: str,
+                            month_str: str,
+                            final_dicts: dict,
+                            day_str: str = None) -> None:
+    """
+    Polars equivalent of running process_hypergiant for every hypergiant of one snapshot.
+    All metrics are expressed as lazy queries over a shared merged plan and collected
+    together, so Polars can prune columns, reuse the join and run multithreaded.
+    """
+    import polars as pl
+    yymm_str = f"{year_str}_{month_str}" if day_str is None else f"{year_str}_{month_str}_{day_str}"
+    merged = hypergiant_merged_lazy(tables, hypergiants_dict).with_columns(
+        (pl.col('city_netfac') + '-' + pl.col('country_netfac')).alias('city_country')
+    )
+
+    summary = merged.group_by('hypergiant', maintain_order=True).agg(
+        pl.col('name_fac').drop_nulls().n_unique().alias('fac_count'),
+        pl.col('speed').sum().alias('capacities'),
+        pl.col('name_netixlan').drop_nulls().n_unique().alias('ixps'),
+        pl.col('city_netfac').drop_nulls().n_unique().alias('cities'),
+        pl.col('country_netfac').drop_nulls().n_unique().alias('countries'),
+        pl.col('city_country').drop_nulls().unique(maintain_order=True).alias('cities_specific'),
+        pl.col('country_netfac').drop_nulls().unique(maintain_order=True).alias('countries_specific'),
+        pl.col('name_fac').drop_nulls().unique(maintain_order=True).alias('fac'),
+    )
+    # Capacity per port (IXP, IP address): sum of its distinct speeds; per IXP: sum over its ports
+    port_capacities = (
+        merged.drop_nulls(['name_netixlan', 'ipaddr4'])
+        .unique(['hypergiant', 'name_netixlan', 'ipaddr4', 'speed'], maintain_order=True)
+        .group_by(['hypergiant', 'name_netixlan', 'ipaddr4'], maintain_order=True)
+        .agg(pl.col('speed').sum())
+    )
+    capacities_ixp = (
+        port_capacities.group_by(['hypergiant', 'name_netixlan'], maintain_order=True)
+        .agg(pl.col('speed').sum())
+    )
+    ases_in_infra = (
+        merged.drop_nulls('name_fac')
+        .group_by(['hypergiant', 'name_fac'], maintain_order=True)
+        .agg(pl.col('local_asn').unique(maintain_order=True))
+    )
+    first_facility = (
+        merged.drop_nulls('city_country')
+        .group_by(['hypergiant', 'city_country'], maintain_order=True)
+        .agg(pl.col('name_fac').first())
+    )
+    summary, capacities_ixp, port_capacities, ases_in_infra, first_facility = pl.collect_all(
+        [summary, capacities_ixp, port_capacities, ases_in_infra, first_facility]
+    )
+
+    per_hypergiant = {}
+    for name, frame in (('capacities_ixp', capacities_ixp), ('ases_in_new_infra', ases_in_infra),
+                        ('first_facility', first_facility)):
+        for (hg_key,), group in frame.group_by('hypergiant', maintain_order=True):
+            values = group.drop('hypergiant').rows()
+            per_hypergiant.setdefault(hg_key, {})[name] = {key: value for key, value in values}
+    for (hg_key,), group in port_capacities.group_by('hypergiant', maintain_order=True):
+        per_hypergiant.setdefault(hg_key, {})['port_capacities'] = {
+            (ixp, ipaddr4): speed for ixp, ipaddr4, speed in group.drop('hypergiant').rows()
+        }
+
+    # Fill final_dicts in the same order and layout as process_hypergiant
+    summary_rows = {row['hypergiant']: row for row in summary.iter_rows(named=True)}
+    for hg_key in hypergiants_dict:
+        if hg_key not in summary_rows:
+            close_footprint(final_dicts, hg_key, yymm_str)
+            continue
+        row = summary_rows[hg_key]
+        extra = per_hypergiant.get(hg_key, {})
+        for key in ('fac_count', 'capacities', 'cities', 'countries', 'cities_specific', 'countries_specific', 'fac'):
+            final_dicts[key].setdefault(hg_key, {})[yymm_str] = row[key]
+        final_dicts['capacities_ixp'].setdefault(hg_key, {})[yymm_str] = extra.get('capacities_ixp', {})
+        final_dicts['ixps'] = row['ixps']
+        final_dicts['ases_in_new_infra'].setdefault(hg_key, {})[yymm_str] = dict(
+            sorted(extra.get('ases_in_new_infra', {}).items())
+        )
+        track_city_appearances(final_dicts, hg_key, yymm_str, extra.get('first_facility', {}))
+        track_footprint_changes(final_dicts, hg_key, yymm_str,
+                                hypergiant_footprint(row['fac'], row['cities_specific'], row['countries_specific'],
+                                                     extra.get('port_capacities', {})))
+
+def compare_final_dicts(expected: dict, actual: dict) -> list:
+    """
+    Return the (metric, hypergiant, snapshot) entries that differ between two final_dicts,
+    e.g. to check the Polars backend against the pandas one.
+    """
+    expected = json.loads(json.dumps(expected, cls=NpEncoder))
+    actual = json.loads(json.dumps(actual, cls=NpEncoder))
+    differences = []
+    for metric in sorted(set(expected) | set(actual)):
+        expected_metric, actual_metric = expected.get(metric), actual.get(metric)
+        if not isinstance(expected_metric, dict) or not isinstance(actual_metric, dict):
+            if expected_metric != actual_metric:
+                differences.append((metric, None, None))
+            continue
+        for hg_key in sorted(set(expected_metric) | set(actual_metric)):
+            expected_hg, actual_hg = expected_metric.get(hg_key, {}), actual_metric.get(hg_key, {})
+            for key in sorted(set(expected_hg) | set(actual_hg)):
+                if expected_hg.get(key) != actual_hg.get(key):
+                    differences.append((metric, hg_key, key))
+    return differences
+
+def verify_polars_backend(file_path: str, hypergiants_dict: dict) -> list:
+    """
+    Aggregate one dump with both backends and return their differences (empty if identical).
+    """
+    snapshot = peeringdb_snapshot_date(file_path)
+    if snapshot is None:
+        raise ValueError(f"{file_path} is not named like a PeeringDB dump (see SNAPSHOT_FILE_PATTERN)")
+    year_str, month_str = str(snapshot.year), str(snapshot.month).zfill(2)
+
+    expected = init_final_dicts()
+    merged_df = parse_peeringdb_dump(file_path)['merged']
+    for hg_key, hg_data in hypergiants_dict.items():
+        hg_subset = merged_df[merged_df['asn'].isin(hg_data.get('asns', []))]
+        if not hg_subset.empty:
+            process_hypergiant(hg_subset, hg_key, year_str, month_str, expected)
+
+    actual = init_final_dicts()
+    process_snapshot_polars(load_polars_tables(file_path), hypergiants_dict, year_str, month_str, actual)
+    return compare_final_dicts(expected, actual)
+
+###############################################################################
+#                         DELTA SNAPSHOT STORE
+###############################################################################
+
+# Per-snapshot results of process_hypergiant (as opposed to the cumulative
+# first_appearance / first_disappearance and the scalar 'ixps')
+PER_SNAPSHOT_KEYS = ('capacities', 'capacities_ixp', 'cities', 'countries', 'fac_count', 'fac',
+                     'cities_specific', 'countries_specific', 'ases_in_new_infra')
+
+def compute_table_delta(old_df: pd.DataFrame, new_df: pd.DataFrame) -> dict:
+    """
+    Row-level difference between two versions of a PeeringDB table, keyed by 'id'.
+    Rows present in both versions are considered updated when their 'updated'
+    timestamp differs (or, if the table has no such column, when any value differs).
+    Returns {'inserts': DataFrame, 'updates': DataFrame, 'deletes': ndarray of ids}.
+    """
+    old_ids = old_df['id'].to_numpy()
+    new_ids = new_df['id'].to_numpy()
+    inserted = ~np.isin(new_ids, old_ids)
+    deleted = ~np.isin(old_ids, new_ids)
+
+    common = new_df[~inserted]
+    old_common = old_df.set_index('id').loc[common['id']]
+    if 'updated' in new_df.columns and 'updated' in old_df.columns:
+        changed = common['updated'].to_numpy() != old_common['updated'].to_numpy()
+    else:
+        columns = [c for c in common.columns if c in old_common.columns and c != 'id']
+        changed = (pd.util.hash_pandas_object(common[columns].astype(str), index=False).to_numpy()
+                   != pd.util.hash_pandas_object(old_common[columns].astype(str), index=False).to_numpy())
+        changed |= len(columns) != len(common.columns) - 1
+
+    return {
+        'inserts': new_df[inserted],
+        'updates': common[changed],
+        'deletes': old_ids[deleted],
+    }
+
+def apply_table_delta(df: pd.DataFrame, delta: dict) -> pd.DataFrame:
+    """
+    Apply a delta produced by compute_table_delta to a table and return the new version
+    (rows ordered by 'id').
+    """
+    replaced = np.concatenate([delta['deletes'], delta['updates']['id'].to_numpy()])
+    kept = df[~df['id'].isin(replaced)]
+    parts = [part for part in (kept, delta['inserts'], delta['updates']) if not part.empty]
+    if not parts:
+        return df.iloc[0:0]
+    return pd.concat(parts, ignore_index=True).sort_values('id', kind='stable').reset_index(drop=True)
+
+def load_snapshot_tables(file_path: str, tables: tuple = None) -> dict:
+    """
+    Load the raw PeeringDB tables (with their original 'id' columns) from a dump file:
+    `tables` (default: PEERINGDB_TABLES) only, and without merging them.
+    """
+    data = load_peeringdb_dump(file_path)
+    return {table: pd.DataFrame(data[table]['data']).sort_values('id', kind='stable').reset_index(drop=True)
+            for table in (tables or PEERINGDB_TABLES)}
+
+def build_snapshot_store(snapshots: list, store_directory: str) -> list:
+    """
+    Build (or update) a delta snapshot store from a list of (date, file_path) snapshots.
+    The store keeps the first snapshot in full ('base.pickle') and, for every following
+    snapshot, only the rows inserted, updated and deleted since the previous one
+    ('delta_YYYY_MM_DD.pickle'). 'index.json' lists the stored dates in order, with the
+    signature (name, size, mtime) of the dump each one was parsed from.
+    Stored snapshots are kept up to the first one whose date or dump signature differs from
+    `snapshots`; the store is rebuilt from there on, so it can be updated as new dumps arrive
+    or existing ones are replaced.
+    Returns the list of stored dates.
+    """
+    os.makedirs(store_directory, exist_ok=True)
+    stored = read_snapshot_store_index(store_directory, with_signatures=True)
+    wanted = [[snapshot_date.isoformat(), file_signature(file_path)] for snapshot_date, file_path in snapshots]
+    kept = 0
+    while kept < min(len(stored), len(wanted)) and stored[kept] == wanted[kept]:
+        kept += 1
+
+    # Drop the snapshots from the first changed one on (their deltas depend on the previous tables)
+    for position, (iso_date, _) in enumerate(stored[kept:], start=kept):
+        file_name = 'base.pickle' if position == 0 else f"delta_{iso_date.replace('-', '_')}.pickle"
+        if os.path.exists(os.path.join(store_directory, file_name)):
+            os.remove(os.path.join(store_directory, file_name))
+    stored = stored[:kept]
+    write_snapshot_store_index(store_directory, stored)
+
+    previous_tables = None
+    if stored and kept < len(snapshots):
+        for _, previous_tables in iter_snapshot_store(store_directory):
+            pass
+
+    # Dumps are parsed in a background thread while the previous snapshot's delta is computed
+    new_snapshots = snapshots[kept:]
+    signatures = dict(wanted[kept:])
+    for snapshot_date, tables in tqdm(prefetch_peeringdb_snapshots(new_snapshots, parser=load_snapshot_tables),
+                                      total=len(new_snapshots), desc="Building snapshot store"):
+        if previous_tables is None:
+            with open(os.path.join(store_directory, 'base.pickle'), 'wb') as f:
+                pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            delta = {table: compute_table_delta(previous_tables[table], tables[table]) for table in PEERINGDB_TABLES}
+            with open(os.path.join(store_directory, f"delta_{snapshot_date.strftime('%Y_%m_%d')}.pickle"), 'wb') as f:
+                pickle.dump(delta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        stored.append([snapshot_date.isoformat(), signatures[snapshot_date.isoformat()]])
+        # Keep the index in sync after each snapshot so an interrupted build can be resumed
+        write_snapshot_store_index(store_directory, stored)
+        previous_tables = tables
+
+    return [iso_date for iso_date, _ in stored]
+
+def write_snapshot_store_index(store_directory: str, entries: list) -> None:
+    """
+    Save the [iso_date, signature] entries of a delta snapshot store to its 'index.json'.
+    """
+    with open(os.path.join(store_directory, 'index.json'), 'w') as f:
+        json.dump({'dates': [iso_date for iso_date, _ in entries],
+                   'signatures': [signature for _, signature in entries]}, f)
+
+def read_snapshot_store_index(store_directory: str, with_signatures: bool = False) -> list:
+    """
+    Return the ISO dates stored in a delta snapshot store (empty if the store does not exist),
+    or [iso_date, signature] entries if `with_signatures` (signature is None for stores
+    written before signatures were recorded, so those snapshots are re-parsed).
+    """
+    index_path = os.path.join(store_directory, 'index.json')
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if isinstance(index, list):
+        index = {'dates': index, 'signatures': [None] * len(index)}
+    if not with_signatures:
+        return index['dates']
+    return [list(entry) for entry in zip(index['dates'], index['signatures'])]
+
+def iter_snapshot_store(store_directory: str, with_deltas: bool = False):
+    """
+    Generator replaying a delta snapshot store in date order. Yields (date, tables),
+    or (date, tables, delta) if `with_deltas` (delta is None for the base snapshot).
+    Each step only applies that snapshot's changes to the previous tables.
+    """
+    stored_dates = read_snapshot_store_index(store_directory)
+    tables = None
+    for iso_date in stored_dates:
+        snapshot_date = datetime.date.fromisoformat(iso_date)
+        if tables is None:
+            tables = load_pickle_file(os.path.join(store_directory, 'base.pickle'))
+            delta = None
+        else:
+            delta = load_pickle_file(os.path.join(store_directory, f"delta_{snapshot_date.strftime('%Y_%m_%d')}.pickle"))
+            tables = {table: apply_table_delta(tables[table], delta[table]) for table in PEERINGDB_TABLES}
+        yield (snapshot_date, tables, delta) if with_deltas else (snapshot_date, tables)
+
+def reconstruct_snapshot(store_directory: str, snapshot_date: datetime.date) -> dict:
+    """
+    Rebuild the raw PeeringDB tables of one stored snapshot.
+    """
+    for stored_date, tables in iter_snapshot_store(store_directory):
+        if stored_date == snapshot_date:
+            return tables
+    raise KeyError(f"{snapshot_date} is not in the snapshot store {store_directory}")
+
+def changed_asns(previous_tables: dict, tables: dict, delta: dict) -> set:
+    """
+    Return the ASNs (as strings) whose merged PeeringDB rows may differ between two
+    consecutive snapshots, given the delta between them.
+    """
+    def touched(table, column):
+        ids = np.concatenate([delta[table]['inserts'][column].to_numpy(),
+                              delta[table]['updates'][column].to_numpy(),
+                              previous_tables[table].loc[previous_tables[table]['id'].isin(delta[table]['deletes']),
+                                                         column].to_numpy()])
+        # Updates may also move a row away from its previous value (e.g. a netfac changing net_id)
+        updated_ids = delta[table]['updates']['id']
+        previous_values = previous_tables[table].loc[previous_tables[table]['id'].isin(updated_ids), column]
+        return set(ids.tolist()) | set(previous_values.tolist())
+
+    net_ids = touched('net', 'id') | touched('netfac', 'net_id') | touched('netixlan', 'net_id')
+    org_ids = touched('org', 'id')
+    fac_ids = touched('fac', 'id')
+    for net_df, netfac_df in ((previous_tables['net'], previous_tables['netfac']), (tables['net'], tables['netfac'])):
+        net_ids |= set(net_df.loc[net_df['org_id'].isin(org_ids), 'id'].tolist())
+        net_ids |= set(netfac_df.loc[netfac_df['fac_id'].isin(fac_ids), 'net_id'].tolist())
+
+    asns = set()
+    for net_df in (previous_tables['net'], tables['net']):
+        asns |= set(net_df.loc[net_df['id'].isin(net_ids), 'asn'].astype(str).tolist())
+    return asns
+
+def process_data_from_store(store_directory: str,
+                            hypergiants_dict,
+                            by_day: bool = False,
+                            previous: dict = None,
+                            backend: str = None) -> dict:
+    """
+    Equivalent of process_data driven by a delta snapshot store.
+    For each snapshot, only the hypergiants whose networks are touched by that snapshot's
+    delta, or whose membership changed since the previous snapshot, are re-merged and
+    re-processed; the others carry their previous results forward.
+    `hypergiants_dict` is a static hypergiant dict or an interval index (see process_data).
+    `previous` optionally describes an earlier run on the same store with the same code:
+    {'final_dicts': ..., 'hypergiants': its hypergiant dict or interval index, 'keys': the
+    snapshot keys it covered}. Each hypergiant then reuses those results up to the first
+    snapshot where its membership differs (or that was not covered) and is only recomputed
+    from there on; results for snapshots no longer in the store are dropped.
+    `backend` selects the aggregation engine (defaults to AGGREGATION_BACKEND).
+    Results are keyed by 'YYYY_MM' (or 'YYYY_MM_DD' if `by_day`).
+    """
+    resolve_hypergiants = hypergiant_resolver(hypergiants_dict)
+    dates = [datetime.date.fromisoformat(iso_date) for iso_date in read_snapshot_store_index(store_directory)]
+    cadence = 'daily' if by_day else 'first-of-month'
+    backend = backend or AGGREGATION_BACKEND
+    final_dicts = init_final_dicts()
+
+    # First snapshot key from which each hypergiant must be recomputed (absent: fully reused)
+    resume_from = {}
+    if previous is not None:
+        resolve_previous = hypergiant_resolver(previous['hypergiants'])
+        covered = set(previous['keys'])
+        for snapshot_date in dates:
+            yymm_str = snapshot_key(snapshot_date, cadence)
+            current, old = resolve_hypergiants(snapshot_date), resolve_previous(snapshot_date)
+            for hg_key in list(current) + list(old):
+                if hg_key in resume_from:
                     continue
-                process_hypergiant(hg_subset, hg_key, str(year), str(month).zfill(2), final_dicts)
+                if (yymm_str not in covered or set(current.get(hg_key, {}).get('asns', []))
+                        != set(old.get(hg_key, {}).get('asns', []))):
+                    resume_from[hg_key] = yymm_str
 
+        # Snapshots dropped from the store since the previous run are never reused
+        stored_keys = {snapshot_key(snapshot_date, cadence) for snapshot_date in dates}
+
+        def reused(hg_key, yymm_str):
+            return yymm_str in stored_keys and (hg_key not in resume_from or yymm_str < resume_from[hg_key])
+
+        for key in final_dicts:
+            if key == 'ixps':
+                final_dicts[key] = previous['final_dicts'].get(key, {})
+                continue
+            if key in ('events', 'footprints'):
+                continue
+            for hg_key, values in previous['final_dicts'].get(key, {}).items():
+                if key == 'first_appearance':
+                    kept = {city: value for city, value in values.items() if reused(hg_key, value[1])}
+                else:
+                    # Per-snapshot values are keyed by snapshot; first_disappearance maps to one
+                    kept = {k: v for k, v in values.items()
+                            if reused(hg_key, v if key == 'first_disappearance' else k)}
+                if kept:
+                    final_dicts[key][hg_key] = kept
+        # Change events up to the resumption point; the footprints to diff against are replayed from them
+        final_dicts['events'] = [event for event in previous['final_dicts'].get('events', [])
+                                 if reused(event[0], event[1])]
+        for hg_key, footprint in replay_change_events(final_dicts['events']).items():
+            final_dicts['footprints'][hg_key] = footprint
+
+    previous_tables = None
+    previous_key = None
+    previous_membership = {}
+    positions = {}
+    for snapshot_date, tables, delta in tqdm(iter_snapshot_store(store_directory, with_deltas=True),
+                                             total=len(dates), desc="Processing Snapshot Store"):
+        year_str, month_str = str(snapshot_date.year), str(snapshot_date.month).zfill(2)
+        day_str = str(snapshot_date.day).zfill(2) if by_day else None
+        yymm_str = f"{year_str}_{month_str}" if day_str is None else f"{year_str}_{month_str}_{day_str}"
+
+        current = resolve_hypergiants(snapshot_date)
+        positions[yymm_str] = {hg_key: i for i, hg_key in enumerate(current)}
+        pending = {hg_key: hg_data for hg_key, hg_data in current.items()
+                   if previous is None or not reused(hg_key, yymm_str)}
+        if delta is None:
+            affected = dict(pending)
+        else:
+            asns = changed_asns(previous_tables, tables, delta)
+            affected = {hg_key: hg_data for hg_key, hg_data in pending.items()
+                        if asns.intersection(hg_data.get('asns', []))
+                        or set(hg_data.get('asns', [])) != previous_membership.get(hg_key)}
+
+        # Unchanged hypergiants: carry the previous snapshot's results forward
+        for hg_key in pending:
+            if hg_key in affected:
+                continue
+            for key in PER_SNAPSHOT_KEYS:
+                if previous_key in final_dicts[key].get(hg_key, {}):
+                    final_dicts[key][hg_key][yymm_str] = final_dicts[key][hg_key][previous_key]
+
+        if affected:
+            asn_list = {asn for hg_data in affected.values() for asn in hg_data.get('asns', [])}
+            net_ids = tables['net'].loc[tables['net']['asn'].astype(str).isin(asn_list), 'id']
+            if backend == 'polars':
+                process_snapshot_polars(polars_tables_from_pandas(tables, net_ids=net_ids), affected,
+                                        year_str, month_str, final_dicts, day_str=day_str)
+            else:
+                merged_df = merge_peeringdb_tables(tables, net_ids=net_ids)['merged']
+                for hg_key, hg_data in affected.items():
+                    hg_subset = merged_df[merged_df['asn'].isin(hg_data.get('asns', []))]
+                    if hg_subset.empty:
+                        close_footprint(final_dicts, hg_key, yymm_str)
+                        continue
+                    process_hypergiant(hg_subset, hg_key, year_str, month_str, final_dicts, day_str=day_str)
+        # Hypergiants dropped from the (dated) hypergiant list, unless reused from `previous`
+        close_unlisted_footprints(final_dicts, yymm_str,
+                                  set(current) | {hg_key for hg_key in final_dicts['footprints']
+                                                  if previous is not None and reused(hg_key, yymm_str)})
+
+        previous_tables = tables
+        previous_key = yymm_str
+        previous_membership = {hg_key: set(hg_data.get('asns', [])) for hg_key, hg_data in current.items()}
+
+    if previous is not None:
+        # Reused and recomputed events back in (snapshot, hypergiant) order; the hypergiants no
+        # longer listed come last, by name (see close_unlisted_footprints)
+        final_dicts['events'].sort(key=lambda event: (event[1], positions[event[1]].get(event[0], len(positions[event[1]])),
+                                                      event[0] if event[0] not in positions[event[1]] else ''))
     return final_dicts
 
+###############################################################################
+#                  OUT-OF-CORE PROCESSING OF ALL NETWORKS
+###############################################################################
+
+# Number of partitions (by ASN) the networks are split into in all-networks mode
+NETWORK_PARTITIONS = 16
+# Aggregation engine of the all-networks mode. Polars by default, whatever AGGREGATION_BACKEND:
+# the pandas path runs process_hypergiant once per network, about 10x slower
+NETWORK_AGGREGATION_BACKEND = 'polars'
+
+def aggregate_network_partition(tables: dict, net_ids, yymm_parts: tuple, backend: str) -> dict:
+    """
+    Run the process_hypergiant metrics for every network in `net_ids`, treating each
+    network (keyed by its ASN as a string) like a hypergiant, on one snapshot.
+    `tables` are pandas tables (load_snapshot_tables) or Polars ones (load_polars_tables).
+    Returns a fresh final_dicts holding only this snapshot.
+    """
+    year_str, month_str, day_str = yymm_parts
+    partial = init_final_dicts()
+    if backend == 'polars':
+        import polars as pl
+        part_tables = dict(tables, net=tables['net'].filter(pl.col('id').is_in(list(net_ids))))
+        asns = part_tables['net']['asn'].cast(pl.String).unique(maintain_order=True).to_list()
+        process_snapshot_polars(part_tables, {asn: {'asns': [asn]} for asn in asns},
+                                year_str, month_str, partial, day_str=day_str)
+    else:
+        merged_df = merge_peeringdb_tables(tables, net_ids=net_ids)['merged']
+        for asn, network_df in merged_df.groupby('asn', sort=False):
+            process_hypergiant(network_df.copy(), asn, year_str, month_str, partial, day_str=day_str)
+    return partial
+
+def process_all_networks(start_year: int,
+                         end_year: int,
+                         peeringdb_directory: str,
+                         output_directory: str,
+                         cadence: str = None,
+                         backend: str = None,
+                         partitions: int = None) -> dict:
+    """
+    Out-of-core version of process_data computing the process_hypergiant metrics for every
+    network in PeeringDB instead of the hypergiants only.
+    1. The networks of each snapshot are split into `partitions` groups by ASN (ASN modulo
+       `partitions`, so a network stays in the same partition even if its PeeringDB net id
+       changes); the per-network aggregates of every (partition, snapshot) are spilled to
+       disk as soon as computed.
+    2. Each partition's spilled snapshots are then combined in date order (including the
+       first appearance/disappearance tracking) into networks_XXXX.json, with the same
+       layout as final_dicts: {metric: {asn: {date: value}}}.
+    Peak memory is bounded by one snapshot plus one partition's history, whatever the
+    number of networks. Returns {asn: partition file}, also saved as network_partitions.json.
+    `backend` defaults to NETWORK_AGGREGATION_BACKEND.
+    """
+    cadence = cadence or SNAPSHOT_CADENCE
+    backend = backend or NETWORK_AGGREGATION_BACKEND
+    partitions = partitions or NETWORK_PARTITIONS
+    by_day = cadence not in ('monthly', 'first-of-month')
+    spill_directory = os.path.join(output_directory, 'spill')
+    shutil.rmtree(spill_directory, ignore_errors=True)  # Leftovers of an interrupted run
+    os.makedirs(spill_directory)
+
+    snapshots = select_snapshots(scan_peeringdb_snapshots(peeringdb_directory),
+                                 cadence=cadence,
+                                 start_date=datetime.date(start_year, 1, 1),
+                                 end_date=datetime.date(end_year, 12, 31),
+                                 skip_unchanged=SKIP_UNCHANGED_SNAPSHOTS)
+    parser = load_polars_tables if backend == 'polars' else load_snapshot_tables
+
+    # 1. Per (partition, snapshot) aggregation, spilled to disk
+    spilled_partitions = set()
+    for snapshot_date, tables in tqdm(prefetch_peeringdb_snapshots(snapshots, parser=parser),
+                                      total=len(snapshots), desc="Aggregating all networks"):
+        yymm_parts = (str(snapshot_date.year), str(snapshot_date.month).zfill(2),
+                      str(snapshot_date.day).zfill(2) if by_day else None)
+        net_ids = pd.Series(tables['net']['id'].to_list(), dtype='int64')
+        asns = pd.Series(tables['net']['asn'].to_list(), dtype='int64')
+        for partition, partition_ids in net_ids.groupby(asns % partitions):
+            partial = aggregate_network_partition(tables, partition_ids.to_numpy(), yymm_parts, backend)
+            partition_directory = os.path.join(spill_directory, f"partition_{partition:04d}")
+            os.makedirs(partition_directory, exist_ok=True)
+            with open(os.path.join(partition_directory, f"{snapshot_date.isoformat()}.pickle"), 'wb') as f:
+                pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+            spilled_partitions.add(int(partition))
+
+    # 2. Combine each partition's snapshots in date order
+    network_files = {}
+    for partition in tqdm(sorted(spilled_partitions), desc="Combining network partitions"):
+        partition_directory = os.path.join(spill_directory, f"partition_{partition:04d}")
+        final_dicts = init_final_dicts()
+        for snapshot_date, _ in snapshots:
+            # No spill file: none of the partition's networks is in this snapshot
+            file_path = os.path.join(partition_directory, f"{snapshot_date.isoformat()}.pickle")
+            partial = load_pickle_file(file_path) if os.path.exists(file_path) else init_final_dicts()
+            # Networks that left PeeringDB (or lost all their rows) since the previous snapshot
+            close_unlisted_footprints(final_dicts, snapshot_key(snapshot_date, cadence), partial['footprints'])
+            for asn, dates in partial['fac_count'].items():
+                yymm_str = next(iter(dates))
+                for key in PER_SNAPSHOT_KEYS:
+                    if asn in partial[key]:
+                        final_dicts[key].setdefault(asn, {})[yymm_str] = partial[key][asn][yymm_str]
+                city_first_facility = {city: facility_name
+                                       for city, (facility_name, _) in partial['first_appearance'].get(asn, {}).items()}
+                track_city_appearances(final_dicts, asn, yymm_str, city_first_facility)
+                track_footprint_changes(final_dicts, asn, yymm_str, partial['footprints'][asn])
+        del final_dicts['ixps']  # Scalar overwritten per network, meaningless here
+        del final_dicts['footprints']  # Only needed to compute the events
+
+        file_name = f"networks_{partition:04d}.json"
+        with open(os.path.join(output_directory, file_name), 'w') as f:
+            json.dump(final_dicts, f, cls=NpEncoder)
+        network_files.update({asn: file_name for asn in final_dicts['fac_count']})
+        shutil.rmtree(partition_directory)
+    shutil.rmtree(spill_directory)
+
+    with open(os.path.join(output_directory, 'network_partitions.json'), 'w') as f:
+        json.dump(network_files, f)
+    return network_files
+
+def load_network_results(output_directory: str, asn) -> dict:
+    """
+    Load the per-network structures computed by process_all_networks for one ASN:
+    {metric: {date: value}}, like final_dicts[metric][hypergiant] for a hypergiant, plus
+    its change events under 'events'.
+    Only the partition file holding that network is read.
+    """
+    network_files = load_json_file(os.path.join(output_directory, 'network_partitions.json'))
+    asn = str(asn)
+    if asn not in network_files:
+        return None
+    partition_results = load_json_file(os.path.join(output_directory, network_files[asn]))
+    events = [tuple(event) for event in partition_results.pop('events') if event[0] == asn]
+    results = {metric: per_network[asn] for metric, per_network in partition_results.items() if asn in per_network}
+    results['events'] = events
+    return results
+
+###############################################################################
+#                  FACILITY PRESENCE MATRICES & OVERLAP ANALYTICS
+###############################################################################
+
+# Raw tables read for the presence matrices (the all-networks merge is never built)
+PRESENCE_TABLES = ('net', 'netfac', 'fac')
+
+def network_facility_matrix(tables: dict, asn_rows: dict, n_facilities: int = None) -> sp.csr_matrix:
+    """
+    Build the sparse network x facility incidence matrix of one snapshot from its raw
+    'net' and 'netfac' tables (as returned by load_snapshot_tables).
+    Rows are stable integer ids taken from `asn_rows` (ASN -> row), which is extended
+    in place with the ASNs seen for the first time; columns are PeeringDB facility ids,
+    which are themselves stable across snapshots.
+    """
+    pairs = tables['netfac'][['net_id', 'fac_id']].merge(tables['net'][['id', 'asn']].rename(columns={'id': 'net_id'}),
+                                                          on='net_id', how='inner')
+    asns = pairs['asn'].astype(np.int64).to_numpy()
+    fac_ids = pairs['fac_id'].astype(np.int64).to_numpy()
+
+    for asn in np.unique(asns):
+        asn_rows.setdefault(int(asn), len(asn_rows))
+    rows = pd.Index(list(asn_rows.keys())).get_indexer(asns)
+
+    n_facilities = max(n_facilities or 0, int(fac_ids.max()) + 1 if len(fac_ids) else 0)
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, fac_ids)),
+                           shape=(len(asn_rows), n_facilities))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1  # Presence, not number of netfac records
+    return matrix
+
+def build_presence_matrices(peeringdb_directory: str,
+                            start_year: int,
+                            end_year: int,
+                            cadence: str = None) -> dict:
+    """
+    Build, for every selected snapshot, the network x facility incidence matrix covering
+    all networks in PeeringDB (see network_facility_matrix). All matrices share the same
+    shape and row/column ids. Returns a dict with:
+        'asns': row id -> ASN,
+        'facility_names': facility id -> latest known facility name,
+        'matrices': {'YYYY_MM' (or 'YYYY_MM_DD'): csr_matrix}
+    """
+    cadence = cadence or SNAPSHOT_CADENCE
+    snapshots = select_snapshots(scan_peeringdb_snapshots(peeringdb_directory),
+                                 cadence=cadence,
+                                 start_date=datetime.date(start_year, 1, 1),
+                                 end_date=datetime.date(end_year, 12, 31),
+                                 skip_unchanged=SKIP_UNCHANGED_SNAPSHOTS)
+    asn_rows = {}
+    facility_names = {}
+    matrices = {}
+    parser = functools.partial(load_snapshot_tables, tables=PRESENCE_TABLES)
+    for snapshot_date, tables in tqdm(prefetch_peeringdb_snapshots(snapshots, parser=parser),
+                                      total=len(snapshots), desc="Building presence matrices"):
+        matrices[snapshot_key(snapshot_date, cadence)] = network_facility_matrix(tables, asn_rows)
+        facility_names.update(zip(tables['fac']['id'].astype(int), tables['fac']['name']))
+
+    # Align all snapshots on the final set of rows/columns
+    n_facilities = max([m.shape[1] for m in matrices.values()], default=0)
+    for matrix in matrices.values():
+        matrix.resize((len(asn_rows), n_facilities))
+
+    return {
+        'asns': list(asn_rows.keys()),
+        'facility_names': facility_names,
+        'matrices': matrices
+    }
+
+def save_presence_matrices(presence: dict, output_directory: str) -> None:
+    """
+    Save the result of build_presence_matrices: one .npz file per snapshot plus a JSON
+    file with the row (ASN) and column (facility) labels.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    for key, matrix in presence['matrices'].items():
+        sp.save_npz(os.path.join(output_directory, f"presence_{key}.npz"), matrix)
+    with open(os.path.join(output_directory, 'presence_labels.json'), 'w') as f:
+        json.dump({'asns': presence['asns'], 'facility_names': presence['facility_names'],
+                   'keys': list(presence['matrices'].keys())}, f, cls=NpEncoder)
+
+def load_presence_matrices(output_directory: str) -> dict:
+    """
+    Load presence matrices saved with save_presence_matrices.
+    """
+    labels = load_json_file(os.path.join(output_directory, 'presence_labels.json'))
+    return {
+        'asns': labels['asns'],
+        'facility_names': {int(fac_id): name for fac_id, name in labels['facility_names'].items()},
+        'matrices': {key: sp.load_npz(os.path.join(output_directory, f"presence_{key}.npz")).tocsr()
+                     for key in labels['keys']}
+    }
+
+def hypergiant_membership_matrix(hypergiants_dict: dict, asns: list) -> sp.csr_matrix:
+    """
+    Sparse hypergiant x network matrix, with a 1 where the network's ASN belongs to the hypergiant.
+    Rows follow the order of `hypergiants_dict`, columns the order of `asns`.
+    """
+    asn_index = pd.Index(asns)
+    rows, cols = [], []
+    for i, hg_data in enumerate(hypergiants_dict.values()):
+        positions = asn_index.get_indexer([int(asn) for asn in hg_data.get('asns', [])])
+        positions = positions[positions >= 0]
+        rows.extend([i] * len(positions))
+        cols.extend(positions.tolist())
+    return sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                         shape=(len(hypergiants_dict), len(asns)))
+
+def hypergiant_presence_matrices(presence: dict, hypergiants_dict: dict) -> dict:
+    """
+    Collapse the network x facility matrices of build_presence_matrices into
+    hypergiant x facility matrices (rows in `hypergiants_dict` order).
+    """
+    membership = hypergiant_membership_matrix(hypergiants_dict, presence['asns'])
+    hypergiant_matrices = {}
+    for key, matrix in presence['matrices'].items():
+        hg_matrix = (membership @ matrix).tocsr()
+        hg_matrix.data[:] = 1
+        hypergiant_matrices[key] = hg_matrix
+    return hypergiant_matrices
+
+def colocation_counts(matrix: sp.csr_matrix) -> np.ndarray:
+    """
+    Number of rows (networks or hypergiants) present in each facility.
+    """
+    return np.asarray(matrix.sum(axis=0)).ravel()
+
+def facilities_hosting_at_least(matrix: sp.csr_matrix, min_count: int) -> np.ndarray:
+    """
+    Ids of the facilities hosting at least `min_count` rows (e.g. facilities with 3+ hypergiants).
+    """
+    return np.flatnonzero(colocation_counts(matrix) >= min_count)
+
+def overlap_matrices(matrix: sp.csr_matrix) -> Tuple[sp.csr_matrix, sp.csr_matrix]:
+    """
+    Pairwise footprint overlap between the rows of an incidence matrix.
+    Returns (intersection, jaccard) as sparse matrices: intersection[i, j] is the number of
+    facilities shared by rows i and j, jaccard[i, j] = |i & j| / |i | j|.
+    Pairs without any shared facility are implicit zeros, so this scales to all networks.
+    """
+    intersection = (matrix @ matrix.T).tocoo()
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    union = sizes[intersection.row] + sizes[intersection.col] - intersection.data
+    jaccard = sp.csr_matrix((intersection.data / union, (intersection.row, intersection.col)),
+                            shape=intersection.shape)
+    return intersection.tocsr(), jaccard
+
+def overlap_time_series(matrices: dict, row_a: int, row_b: int) -> pd.DataFrame:
+    """
+    Time series of the overlap between two rows (e.g. two hypergiants) across snapshots.
+    Returns a DataFrame indexed by snapshot key with the facility counts of each row,
+    their intersection and Jaccard index.
+    """
+    records = []
+    for key in sorted(matrices):
+        pair = matrices[key][[row_a, row_b]]
+        size_a, size_b = np.asarray(pair.sum(axis=1)).ravel()
+        shared = pair[0].multiply(pair[1]).sum()
+        union = size_a + size_b - shared
+        records.append({'date': key, 'count_a': size_a, 'count_b': size_b, 'intersection': shared,
+                        'jaccard': shared / union if union else 0.0})
+    return pd.DataFrame(records).set_index('date')
+
+###############################################################################
+#                     FACILITY <-> ASN INVERTED INDEX
+###############################################################################
+
+# Raw tables read for the inverted index
+FACILITY_INDEX_TABLES = ('netfac', 'fac')
+
+def build_postings(keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group `values` by `keys` into postings lists. Returns (unique_keys, offsets, values) where
+    the sorted values of unique_keys[i] are values[offsets[i]:offsets[i + 1]].
+    """
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    unique_keys, starts = np.unique(keys, return_index=True)
+    return unique_keys, np.append(starts, len(keys)).astype(np.int64), values
+
+def facility_asn_postings(netfac_df: pd.DataFrame) -> dict:
+    """
+    Build both postings directions (facility -> sorted ASNs, ASN -> sorted facilities)
+    of one snapshot from its netfac table.
+    """
+    pairs = netfac_df[['fac_id', 'local_asn']].dropna().astype(np.int64).to_numpy()
+    pairs = np.unique(pairs, axis=0) if len(pairs) else pairs.reshape(0, 2)
+    fac_ids, fac_offsets, fac_asns = build_postings(pairs[:, 0], pairs[:, 1])
+    asn_ids, asn_offsets, asn_facs = build_postings(pairs[:, 1], pairs[:, 0])
+    return {
+        'fac_ids': fac_ids, 'fac_offsets': fac_offsets, 'fac_asns': fac_asns,
+        'asn_ids': asn_ids, 'asn_offsets': asn_offsets, 'asn_facs': asn_facs,
+    }
+
+def pair_codes(fac_ids: np.ndarray, asns: np.ndarray) -> np.ndarray:
+    """
+    Encode (facility id, ASN) pairs as single sortable int64 codes (ASNs are 32-bit).
+    """
+    return (fac_ids.astype(np.int64) << 32) | asns.astype(np.int64)
+
+def build_facility_asn_index(peeringdb_directory: str,
+                             start_year: int,
+                             end_year: int,
+                             cadence: str = None) -> dict:
+    """
+    Build the facility <-> ASN inverted index over all selected snapshots.
+    Only the netfac and fac tables of each snapshot are loaded, once. Returns a dict with:
+        'keys': ordered snapshot keys ('YYYY_MM' or 'YYYY_MM_DD'),
+        'snapshots': {key: postings (see facility_asn_postings)},
+        'first_seen': {'pairs': sorted pair codes, 'snapshot': position in 'keys' where
+                       the (facility, ASN) pair first appeared},
+        'facility_names': facility id -> latest known facility name
+    """
+    cadence = cadence or SNAPSHOT_CADENCE
+    snapshots = select_snapshots(scan_peeringdb_snapshots(peeringdb_directory),
+                                 cadence=cadence,
+                                 start_date=datetime.date(start_year, 1, 1),
+                                 end_date=datetime.date(end_year, 12, 31),
+                                 skip_unchanged=SKIP_UNCHANGED_SNAPSHOTS)
+    index = {'keys': [], 'snapshots': {}, 'facility_names': {}}
+    seen_pairs = np.empty(0, dtype=np.int64)
+    seen_snapshot = np.empty(0, dtype=np.int64)
+    parser = functools.partial(load_snapshot_tables, tables=FACILITY_INDEX_TABLES)
+    for snapshot_date, tables in tqdm(prefetch_peeringdb_snapshots(snapshots, parser=parser),
+                                      total=len(snapshots), desc="Building facility/ASN index"):
+        key = snapshot_key(snapshot_date, cadence)
+        postings = facility_asn_postings(tables['netfac'])
+        index['snapshots'][key] = postings
+        index['facility_names'].update(zip(tables['fac']['id'].astype(int), tables['fac']['name']))
+
+        # Record the snapshot where each (facility, ASN) pair appears for the first time
+        codes = pair_codes(np.repeat(postings['fac_ids'], np.diff(postings['fac_offsets'])), postings['fac_asns'])
+        new_codes = np.setdiff1d(codes, seen_pairs, assume_unique=True)
+        seen_pairs = np.concatenate([seen_pairs, new_codes])
+        seen_snapshot = np.concatenate([seen_snapshot, np.full(len(new_codes), len(index['keys']), dtype=np.int64)])
+        order = np.argsort(seen_pairs, kind='stable')
+        seen_pairs, seen_snapshot = seen_pairs[order], seen_snapshot[order]
+        index['keys'].append(key)
+
+    index['first_seen'] = {'pairs': seen_pairs, 'snapshot': seen_snapshot}
+    return index
+
+def save_facility_asn_index(index: dict, output_directory: str) -> None:
+    """
+    Save the inverted index: one .npz file per snapshot, the first-seen arrays and a JSON metadata file.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    for key, postings in index['snapshots'].items():
+        np.savez(os.path.join(output_directory, f"facility_index_{key}.npz"), **postings)
+    np.savez(os.path.join(output_directory, 'facility_index_first_seen.npz'), **index['first_seen'])
+    with open(os.path.join(output_directory, 'facility_index.json'), 'w') as f:
+        json.dump({'keys': index['keys'], 'facility_names': index['facility_names']}, f, cls=NpEncoder)
+
+def load_facility_asn_index(output_directory: str) -> dict:
+    """
+    Load an inverted index saved with save_facility_asn_index.
+    """
+    meta = load_json_file(os.path.join(output_directory, 'facility_index.json'))
+    snapshots = {}
+    for key in meta['keys']:
+        with np.load(os.path.join(output_directory, f"facility_index_{key}.npz")) as postings:
+            snapshots[key] = {name: postings[name] for name in postings.files}
+    with np.load(os.path.join(output_directory, 'facility_index_first_seen.npz')) as first_seen:
+        first_seen = {name: first_seen[name] for name in first_seen.files}
+    return {
+        'keys': meta['keys'],
+        'snapshots': snapshots,
+        'first_seen': first_seen,
+        'facility_names': {int(fac_id): name for fac_id, name in meta['facility_names'].items()}
+    }
+
+def lookup_postings(ids: np.ndarray, offsets: np.ndarray, values: np.ndarray, key: int) -> np.ndarray:
+    """
+    Return the sorted postings list of `key` (empty if absent) with a binary search.
+    """
+    position = np.searchsorted(ids, key)
+    if position == len(ids) or ids[position] != key:
+        return values[:0]
+    return values[offsets[position]:offsets[position + 1]]
+
+def asns_in_facility(index: dict, fac_id: int, key: str, exclude_asn: int = None) -> np.ndarray:
+    """
+    Sorted ASNs present in facility `fac_id` at snapshot `key`, optionally without `exclude_asn`
+    (i.e. "who else is in this facility").
+    """
+    postings = index['snapshots'][key]
+    asns = lookup_postings(postings['fac_ids'], postings['fac_offsets'], postings['fac_asns'], fac_id)
+    if exclude_asn is not None:
+        asns = asns[asns != exclude_asn]
+    return asns
+
+def facilities_of_asn(index: dict, asn: int, key: str) -> np.ndarray:
+    """
+    Sorted facility ids where `asn` is present at snapshot `key`.
+    """
+    postings = index['snapshots'][key]
+    return lookup_postings(postings['asn_ids'], postings['asn_offsets'], postings['asn_facs'], asn)
+
+def first_join(index: dict, asn: int, fac_id: int) -> str:
+    """
+    Snapshot key at which `asn` was first seen in facility `fac_id`, or None if never.
+    """
+    code = pair_codes(np.array([fac_id]), np.array([asn]))[0]
+    pairs = index['first_seen']['pairs']
+    position = np.searchsorted(pairs, code)
+    if position == len(pairs) or pairs[position] != code:
+        return None
+    return index['keys'][index['first_seen']['snapshot'][position]]
+
+def common_asns(index: dict, fac_ids: list, key: str) -> np.ndarray:
+    """
+    ASNs present in all the given facilities at snapshot `key`.
+    """
+    result = None
+    for fac_id in fac_ids:
+        asns = asns_in_facility(index, fac_id, key)
+        result = asns if result is None else np.intersect1d(result, asns, assume_unique=True)
+    return result if result is not None else np.empty(0, dtype=np.int64)
+
+def common_facilities(index: dict, asns: list, key: str) -> np.ndarray:
+    """
+    Facilities where all the given ASNs are present at snapshot `key`.
+    """
+    result = None
+    for asn in asns:
+        fac_ids = facilities_of_asn(index, asn, key)
+        result = fac_ids if result is None else np.intersect1d(result, fac_ids, assume_unique=True)
+    return result if result is not None else np.empty(0, dtype=np.int64)
+
+###############################################################################
+#                     SQL QUERY LAYER OVER THE SNAPSHOTS
+###############################################################################
+
+# Columns of the `merged` view, mirroring the suffixes produced by merge_peeringdb_tables
+MERGED_VIEW_SQL = """
+CREATE OR REPLACE VIEW merged AS
+SELECT
+    net.snapshot_date,
+    net.id AS net_id, net.org_id, CAST(net.asn AS VARCHAR) AS asn,
+    net.name AS name_net, net.info_type, net.info_traffic,
+    org.name AS name_org, org.city, org.country,
+    netfac.id AS netfac_id, netfac.fac_id, netfac.local_asn,
+    netfac.city AS city_netfac, netfac.country AS country_netfac,
+    netixlan.id AS netixlan_id, netixlan.ix_id, netixlan.name AS name_netixlan,
+    netixlan.speed, netixlan.ipaddr4,
+    fac.name AS name_fac, fac.city AS city_fac, fac.country AS country_fac
+FROM net
+JOIN org ON org.id = net.org_id AND org.snapshot_date = net.snapshot_date
+JOIN netfac ON netfac.net_id = net.id AND netfac.snapshot_date = net.snapshot_date
+JOIN netixlan ON netixlan.net_id = net.id AND netixlan.snapshot_date = net.snapshot_date
+JOIN fac ON fac.id = netfac.fac_id AND fac.snapshot_date = net.snapshot_date
+"""
+
+def sql_ready(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Make a raw PeeringDB table storable as Parquet: nested values (lists/dicts, e.g.
+    social_media) are serialized to JSON and other object columns are cast to strings,
+    so that every snapshot has compatible column types.
+    """
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].map(
+            lambda x: json.dumps(x) if isinstance(x, (list, dict)) else (None if x is None else str(x))
+        )
+    return df
+
+def export_snapshot_store_to_parquet(store_directory: str, parquet_directory: str) -> list:
+    """
+    Export every snapshot of a delta snapshot store as hive-partitioned Parquet files,
+    <parquet_directory>/<table>/snapshot_date=YYYY-MM-DD/data.parquet, so that each table
+    can be queried across all snapshots with partition and column pruning.
+    <parquet_directory>/index.json maps each exported date to the signature of the dump it
+    came from (see build_snapshot_store): partitions whose signature is unchanged are kept,
+    the others are rewritten, and those of dates no longer in the store are removed.
+    Returns the exported dates.
+    """
+    import duckdb
+    index_path = os.path.join(parquet_directory, 'index.json')
+    exported_signatures = load_json_file(index_path) if os.path.exists(index_path) else {}
+    store_index = read_snapshot_store_index(store_directory, with_signatures=True)
+    signatures = dict(store_index)
+
+    for table in PEERINGDB_TABLES:
+        table_directory = os.path.join(parquet_directory, table)
+        if not os.path.isdir(table_directory):
+            continue
+        for partition in os.listdir(table_directory):
+            if partition.split('=', 1)[-1] not in signatures:
+                shutil.rmtree(os.path.join(table_directory, partition))
+    exported_signatures = {iso_date: signature for iso_date, signature in exported_signatures.items()
+                           if iso_date in signatures}
+
+    os.makedirs(parquet_directory, exist_ok=True)
+    connection = duckdb.connect()
+    exported = []
+    for snapshot_date, tables in tqdm(iter_snapshot_store(store_directory), total=len(store_index),
+                                      desc="Exporting snapshots to Parquet"):
+        iso_date = snapshot_date.isoformat()
+        exported.append(snapshot_date)
+        if signatures[iso_date] is not None and exported_signatures.get(iso_date) == signatures[iso_date]:
+            continue
+        for table in PEERINGDB_TABLES:
+            partition = os.path.join(parquet_directory, table, f"snapshot_date={iso_date}")
+            os.makedirs(partition, exist_ok=True)
+            connection.register('snapshot_table', sql_ready(tables[table]))
+            connection.execute(f"COPY snapshot_table TO '{os.path.join(partition, 'data.parquet')}' (FORMAT PARQUET)")
+            connection.unregister('snapshot_table')
+        # Only recorded once all its tables are written, so an interrupted export redoes the date
+        exported_signatures[iso_date] = signatures[iso_date]
+        with open(index_path, 'w') as f:
+            json.dump(exported_signatures, f)
+    with open(index_path, 'w') as f:
+        json.dump(exported_signatures, f)
+    connection.close()
+    return exported
+
+def connect_peeringdb_sql(parquet_directory: str, hypergiants_dict=None, database: str = ':memory:'):
+    """
+    Open a DuckDB connection exposing the exported snapshots as SQL views:
+      - org, net, fac, netfac, netixlan: one row per record and snapshot, with a snapshot_date column
+      - merged: the same join as merge_peeringdb_tables, per snapshot
+      - hypergiant_asns (hypergiant, asn, valid_from, valid_to) and merged_hypergiants (merged
+        rows tagged with the hypergiant their ASN belonged to at that snapshot), if
+        `hypergiants_dict` (a load_hypergiants dict or a load_hypergiant_intervals index) is given
+    Filters on snapshot_date only read the matching partitions, and only the columns a
+    query uses are read from the Parquet files.
+    """
+    import duckdb
+    connection = duckdb.connect(database)
+    for table in PEERINGDB_TABLES:
+        pattern = os.path.join(parquet_directory, table, '*', '*.parquet')
+        connection.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM "
+                           f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)")
+    connection.execute(MERGED_VIEW_SQL)
+
+    if hypergiants_dict is not None:
+        if isinstance(hypergiants_dict, pd.DataFrame):
+            hypergiant_asns = hypergiants_dict[['hypergiant', 'asn', 'valid_from', 'valid_to']].astype({'hypergiant': str})
+        else:
+            hypergiant_asns = pd.DataFrame(
+                [(hg_key, str(asn), INTERVAL_MIN_DATE, INTERVAL_MAX_DATE)
+                 for hg_key, hg_data in hypergiants_dict.items() for asn in hg_data.get('asns', [])],
+                columns=['hypergiant', 'asn', 'valid_from', 'valid_to']
+            )
+        connection.register('hypergiant_asns_df', hypergiant_asns)
+        connection.execute("CREATE OR REPLACE TABLE hypergiant_asns AS SELECT hypergiant, asn, "
+                           "CAST(valid_from AS DATE) AS valid_from, CAST(valid_to AS DATE) AS valid_to "
+                           "FROM hypergiant_asns_df")
+        connection.unregister('hypergiant_asns_df')
+        connection.execute("CREATE OR REPLACE VIEW merged_hypergiants AS "
+                           "SELECT h.hypergiant, m.* FROM merged m JOIN hypergiant_asns h ON h.asn = m.asn "
+                           "AND m.snapshot_date >= h.valid_from AND m.snapshot_date < h.valid_to")
+    return connection
+
+def query_peeringdb(sql: str, parquet_directory: str = None, hypergiants_dict=None,
+                    parameters: list = None) -> pd.DataFrame:
+    """
+    Run an ad-hoc SQL query over all snapshots (see connect_peeringdb_sql) and return a DataFrame.
+    Defaults to the Parquet export of the pipeline and the configured hypergiants.
+    """
+    parquet_directory = parquet_directory or hypergiants_evolution_path('parquet')
+    if hypergiants_dict is None:
+        hypergiants_dict = load_hypergiant_intervals(HYPERGIANTS_PATH, FOCUS_HYPERGIANTS)
+    connection = connect_peeringdb_sql(parquet_directory, hypergiants_dict)
+    try:
+        return connection.execute(sql, parameters or []).df()
+    finally:
+        connection.close()
+
+###############################################################################
+#                     TIME SERIES, RESAMPLING & ROLLUPS
+###############################################################################
+
+# Numeric metrics of final_dicts rolled up with ROLLUP_STATISTICS
+ROLLUP_SCALAR_METRICS = ('capacities', 'cities', 'countries', 'fac_count')
+ROLLUP_STATISTICS = ('last', 'max', 'mean')
+# List-valued metrics of final_dicts rolled up as the number of distinct entries over each period
+ROLLUP_SET_METRICS = ('cities_specific', 'countries_specific', 'fac')
+# Coarser frequencies precomputed on top of the snapshots' own (monthly or daily) frequency
+ROLLUP_FREQUENCIES = ('M', 'Q', 'Y')
+
+def snapshot_periods(keys: pd.Series) -> pd.Series:
+    """
+    Convert result keys ('YYYY_MM' or 'YYYY_MM_DD') to monthly (or daily) periods.
+    """
+    freq = 'M' if len(keys.iloc[0]) == len('YYYY_MM') else 'D'
+    return pd.Series(pd.PeriodIndex(keys.str.replace('_', '-'), freq=freq), index=keys.index)
+
+def metric_frame(final_dicts: dict, metric: str) -> pd.DataFrame:
+    """
+    Long form of one metric of final_dicts: one row per (hypergiant, snapshot) with columns
+    'hypergiant', 'period' (monthly or daily Period) and 'value', in chronological order.
+    """
+    records = [(hg_key, key, value)
+               for hg_key, per_snapshot in final_dicts.get(metric, {}).items()
+               for key, value in per_snapshot.items()]
+    frame = pd.DataFrame(records, columns=['hypergiant', 'key', 'value'])
+    if frame.empty:
+        return frame.assign(period=pd.Series(dtype='period[M]')).drop(columns='key')
+    frame['period'] = snapshot_periods(frame['key'])
+    return frame.drop(columns='key').sort_values('period', kind='stable')[['hypergiant', 'period', 'value']]
+
+def rollup_records(series: pd.Series) -> dict:
+    """
+    {hypergiant: {period: value}} from a Series indexed by (hypergiant, period).
+    """
+    nested = {}
+    for (hg_key, period), value in series.items():
+        nested.setdefault(hg_key, {})[str(period)] = value
+    return nested
+
+def build_rollups(final_dicts: dict) -> dict:
+    """
+    Precompute the time series served by query_timeseries, at the snapshots' frequency and
+    every coarser frequency of ROLLUP_FREQUENCIES:
+      - ROLLUP_SCALAR_METRICS: 'last', 'max' and 'mean' value over each period
+      - ROLLUP_SET_METRICS: 'distinct', the size of the union of the lists over each period
+    Returns {freq: {metric: {statistic: {hypergiant: {period: value}}}}}, periods as strings
+    ('2018-01', '2018Q1', '2018').
+    """
+    rollups = {}
+    for metric in ROLLUP_SCALAR_METRICS + ROLLUP_SET_METRICS:
+        frame = metric_frame(final_dicts, metric)
+        if frame.empty:
+            continue
+        base_freq = 'D' if frame['period'].dtype == pd.PeriodDtype('D') else 'M'
+        frequencies = [base_freq] + [freq for freq in ROLLUP_FREQUENCIES if freq != base_freq]
+        for freq in frequencies:
+            periods = frame.assign(period=frame['period'].dt.asfreq(freq))
+            if metric in ROLLUP_SET_METRICS:
+                # Every (hypergiant, period) observed, including those with empty lists only
+                observed = pd.MultiIndex.from_frame(periods[['hypergiant', 'period']].drop_duplicates())
+                entries = periods.explode('value').dropna(subset=['value'])
+                distinct = (entries.drop_duplicates(['hypergiant', 'period', 'value'])
+                            .groupby(['hypergiant', 'period'], sort=False).size()
+                            .reindex(observed, fill_value=0))
+                statistics = {'distinct': distinct}
+            else:
+                grouped = periods.groupby(['hypergiant', 'period'], sort=False)['value']
+                statistics = {statistic: grouped.agg(statistic) for statistic in ROLLUP_STATISTICS}
+            rollups.setdefault(freq, {})[metric] = {statistic: rollup_records(series)
+                                                     for statistic, series in statistics.items()}
+    return rollups
+
+def query_timeseries(rollups: dict,
+                     metric: str,
+                     freq: str = 'M',
+                     statistic: str = None,
+                     hypergiants: list = None) -> pd.DataFrame:
+    """
+    One rollup of build_rollups as a wide DataFrame: a PeriodIndex at frequency `freq`
+    ('D', 'M', 'Q' or 'Y') by hypergiant columns (NaN where a hypergiant was not observed).
+    `statistic` defaults to 'last' for scalar metrics and 'distinct' for list-valued ones.
+    """
+    statistic = statistic or ('distinct' if metric in ROLLUP_SET_METRICS else 'last')
+    try:
+        per_hypergiant = rollups[freq][metric][statistic]
+    except KeyError:
+        raise ValueError(f"No '{statistic}' rollup of '{metric}' at frequency '{freq}'") from None
+    frame = pd.DataFrame(per_hypergiant)
+    frame.index = pd.PeriodIndex(frame.index, freq=freq)
+    frame = frame.sort_index()
+    if hypergiants is not None:
+        frame = frame.reindex(columns=hypergiants)
+    return frame
+
+def hypergiants_by_latest(frame: pd.DataFrame) -> list:
+    """
+    Hypergiant columns of a (period x hypergiant) frame by decreasing value at the latest
+    period (a hypergiant absent from it counts as 0).
+    """
+    if frame.empty:
+        return list(frame.columns)
+    latest = frame.iloc[-1].fillna(0)
+    return list(latest.sort_values(ascending=False, kind='stable').index)
+
+def timeseries_arrays(frame: pd.DataFrame, columns: list) -> list:
+    """
+    (column, x, y) NumPy arrays of the observed (non-NaN) periods of each column of a
+    period-indexed frame, x being the period labels ('2018-01', '2018Q1', ...).
+    """
+    labels = frame.index.astype(str).to_numpy()
+    values = frame[columns].to_numpy(dtype=float)
+    observed = ~np.isnan(values)
+    return [(column, labels[observed[:, j]], values[observed[:, j], j]) for j, column in enumerate(columns)]
+
+def load_rollups() -> dict:
+    """
+    Load the rollups saved by the aggregate stage.
+    """
+    return load_json_file(hypergiants_evolution_path(f'rollups_{START_YEAR}_{END_YEAR}.json'))
+
 ###############################################################################
 #                       COMPATIBILITY FUNCTION (LEGACY)
 ###############################################################################
@@ -587,64 +2509,6 @@ def prepare_plotly_data(mapping_name, evol_cities, coordinates_city):
 
 
 
-###############################################################################
-#                                   MAIN
-###############################################################################
-
-def main():
-    # 1. Load Hypergiants
-    hypergiants_dict = load_hypergiants(HYPERGIANTS_PATH, FOCUS_HYPERGIANTS)
-
-    # 2. Process data to get final dictionaries
-    final_dicts = process_data(START_YEAR, END_YEAR, hypergiants_dict, PEERINGDB_DATA_DIRECTORY)
-
-    # 3. Study overall CDN evolution (country-level traffic, etc.)
-    # study_cdn_evolution(START_YEAR, END_YEAR, hypergiants_dict, peeringdb_data_directory=PEERINGDB_DATA_DIRECTORY, data_directory=DATA_DIRECTORY)
-
-    # Load Hypergiants files
-    # 4. (Optional) Legacy approach to read & build partial dictionaries
-    # (final_dict_cities,
-    #  final_dict_countries,
-    #  final_dict_fac_count,
-    #  final_dict_capacities,
-    #  final_dict_countries_specific,
-    #  final_dict_cities_specific,
-    #  final_dict_fac) = read_peeringdb_files(START_YEAR, END_YEAR, hypergiants_dict, DATA_DIRECTORY)
-    # # 5. Save data to disk
-    os.makedirs(DATA_DIRECTORY, exist_ok=True)
-
-    with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'final_dicts_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
-        json.dump(final_dicts, f, cls=NpEncoder)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'fac_count_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
-    #     json.dump(final_dict_fac_count, f)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'fac_prop_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
-    #     json.dump(final_dict_fac, f)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'country_count_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
-    #     json.dump(final_dict_countries, f)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'city_count_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
-    #     json.dump(final_dict_cities, f)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'first_apparition_of_infrastructure_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
-    #     json.dump(final_dicts['first_appearance'], f)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'ases_in_the_new_infrastructure_{START_YEAR}_{END_YEAR}.pickle'), 'wb') as f:
-    #     pickle.dump(final_dicts['ases_in_new_infra'], f, protocol=pickle.HIGHEST_PROTOCOL)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'evol_capacities_{START_YEAR}_{END_YEAR}.pickle'), 'wb') as f:
-    #     pickle.dump(final_dict_capacities, f, protocol=pickle.HIGHEST_PROTOCOL)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'evol_cities_{START_YEAR}_{END_YEAR}.pickle'), 'wb') as f:
-    #     pickle.dump(final_dict_cities_specific, f, protocol=pickle.HIGHEST_PROTOCOL)
-    #
-    # with open(os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f'evol_countries_{START_YEAR}_{END_YEAR}.pickle'), 'wb') as f:
-    #     pickle.dump(final_dict_countries_specific, f, protocol=pickle.HIGHEST_PROTOCOL)
-    #
-    # print("\nProcessing complete. All outputs saved.")
-
 key_name_mapping = {
     'ibm': 'IBM',
     'ovh': 'OVH',
@@ -687,30 +2551,51 @@ custom_symbols = [
 # Mapping custom symbols to hypergiants
 symbol_mapping = {key_name_mapping[key]: custom_symbols[i] for i, key in enumerate(key_name_mapping.keys())}
 
+def plotlyjs_bundle_name() -> str:
+    """
+    File name of the plotly.js bundle shared by the HTML reports (versioned, so that a
+    plotly upgrade never reuses a stale bundle).
+    """
+    from plotly.offline import get_plotlyjs_version
+    return f"plotly-{get_plotlyjs_version()}.min.js"
+
+def write_plotlyjs_bundle(directory: str) -> str:
+    """
+    Write the shared plotly.js bundle in `directory` unless it is already there.
+    The file is written atomically, so concurrent report processes never see it half written.
+    """
+    bundle_path = os.path.join(directory, plotlyjs_bundle_name())
+    if not os.path.exists(bundle_path):
+        from plotly.offline import get_plotlyjs
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{bundle_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.replace(temporary_path, bundle_path)
+    return bundle_path
+
+def write_report(fig, file_name: str, auto_open: bool = False) -> str:
+    """
+    Write a figure as REPORT_DIRECTORY/file_name. The HTML references the shared plotly.js
+    bundle instead of inlining its ~4 MB, and is only opened in a browser if `auto_open`
+    and REPORT_AUTO_OPEN are set. Returns the path of the report.
+    """
+    write_plotlyjs_bundle(REPORT_DIRECTORY)
+    file_path = os.path.join(REPORT_DIRECTORY, file_name)
+    pio.write_html(fig, file=file_path, include_plotlyjs=plotlyjs_bundle_name(),
+                   auto_open=auto_open and REPORT_AUTO_OPEN)
+    return file_path
+
 def analysis_city():
-    HYPERGIANTS_DIR = os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution')
-    final_dicts = load_json_file(os.path.join(HYPERGIANTS_DIR, f"final_dicts_{START_YEAR}_{END_YEAR}.json"))
-    # final_dicts = files["final_dicts"]
-    final_dict_cities = final_dicts['cities']
-    print(final_dict_cities)
+    cities = query_timeseries(load_rollups(), 'cities', freq=REPORT_FREQUENCY)
     # Prepare data for Plotly
     fig = go.Figure()
 
-    final_dict_cities = dict(
-        reversed(sorted(
-            final_dict_cities.items(),
-            key=lambda x: list(x[1].values())[-1] if x[1] else 0  # Get the value for the last day
-        ))
-    )
-    # Assign colors to each hypergiant
-    for i, (hg_key, hg_data) in enumerate(final_dict_cities.items()):
+    # One trace per hypergiant, by decreasing number of cities in the latest month
+    traces = []
+    for hg_key, dates, values in timeseries_arrays(cities, hypergiants_by_latest(cities)):
         hg_key = key_name_mapping[hg_key]
-        dates = list(hg_data.keys())
-        dates = [date.replace('_', '-') for date in dates]
-        values = list(hg_data.values())
-        # Add a trace for each hypergiant with a unique color
-
-        fig.add_trace(go.Scatter(
+        traces.append(go.Scatter(
             x=dates,
             y=values,
             mode='lines+markers',
@@ -718,6 +2603,7 @@ def analysis_city():
             marker=dict(symbol=symbol_mapping[hg_key]),  # Add symbols here
             line=dict(color=color_mapping[hg_key])  # Wrap the color in a dict
         ))
+    fig.add_traces(traces)
 
     # Update layout for better interactivity and readability
     fig.update_layout(
@@ -732,37 +2618,30 @@ def analysis_city():
 
 
     # Show the interactive plot
-    pio.write_html(fig, file="cdn_city_evol_timeseries.html", auto_open=False)
+    write_report(fig, "cdn_city_evol_timeseries.html", auto_open=False)
 
 def analysis_country():
     HYPERGIANTS_DIR = os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution')
     final_dicts = load_json_file(os.path.join(HYPERGIANTS_DIR, f"final_dicts_{START_YEAR}_{END_YEAR}.json"))
-    final_dict_countries_specific = final_dicts['countries_specific']
-
-    # Prepare continent-based and hypergiant-based data
-    final_dict_continents = {}
-    all_continents = set()  # To track all continents dynamically
-    all_dates = set()  # To track all unique dates
 
-    # Hypergiant-specific sums across continents
-    sums_by_hypergiant = {}
-
-    for hg_key, date_data in final_dict_countries_specific.items():
-        final_dict_continents[hg_key] = {}
-        sums_by_hypergiant[hg_key] = {}
-        for date, countries in date_data.items():
-            all_dates.add(date)
-            continent_counts = {}
-            for country_iso2 in countries:
-                continent = get_continent_from_iso2(country_iso2)
-                all_continents.add(continent)
-                continent_counts[continent] = continent_counts.get(continent, 0) + 1
-
-            # Store continent counts for this hypergiant and date
-            final_dict_continents[hg_key][date] = continent_counts
-
-            # Calculate sum across all continents for this hypergiant and date
-            sums_by_hypergiant[hg_key][date] = sum(continent_counts.values())
+    # One row per (hypergiant, month, country), the continent of each distinct country looked up once
+    countries = metric_frame(final_dicts, 'countries_specific')
+    entries = countries.explode('value').dropna(subset=['value'])
+    continent_of = {country: get_continent_from_iso2(country) for country in entries['value'].unique()}
+    entries['continent'] = entries['value'].map(continent_of)
+    all_continents = sorted(set(continent_of.values()))  # Ensure consistent button order
+
+    # Wide (month x hypergiant x continent) country counts, and which months each hypergiant was observed in
+    counts = (entries.groupby(['period', 'hypergiant', 'continent']).size()
+              .unstack(['hypergiant', 'continent'], fill_value=0))
+    observed = (pd.crosstab(countries['period'], countries['hypergiant']).gt(0)
+                .reindex(columns=countries['hypergiant'].unique()).sort_index())
+    counts = counts.reindex(index=observed.index, fill_value=0)
+    # Hypergiant-specific sums across continents, NaN where a hypergiant was not observed
+    sums_by_hypergiant = counts.T.groupby(level='hypergiant').sum().T.reindex(columns=observed.columns, fill_value=0)
+    sums_by_hypergiant = sums_by_hypergiant.where(observed.to_numpy(dtype=bool))
+    hypergiants = hypergiants_by_latest(sums_by_hypergiant)
+    dates = observed.index.astype(str).to_numpy()
 
     # Prepare data for Plotly
     fig = go.Figure()
@@ -770,48 +2649,39 @@ def analysis_country():
     # Collect all traces and calculate "All" (sum across continents by hypergiant)
     traces = []
     buttons = []
-    all_continents = sorted(all_continents)  # Ensure consistent button order
 
     # Add traces for each continent per hypergiant
-    for hg_key, date_data in final_dict_continents.items():
+    for hg_key in hypergiants:
         hg_key_name = key_name_mapping[hg_key]  # Get hypergiant name
+        rows = observed[hg_key].to_numpy(dtype=bool)
         for continent in all_continents:
-            dates = []
-            values = []
-            for date, continent_counts in date_data.items():
-                dates.append(date.replace('_', '-'))
-                values.append(continent_counts.get(continent, 0))
+            column = (hg_key, continent)
+            values = counts[column].to_numpy()[rows] if column in counts.columns else np.zeros(rows.sum(), dtype=int)
 
             # Add a trace for each continent and hypergiant
-            trace = go.Scatter(
-                x=dates,
+            traces.append(go.Scatter(
+                x=dates[rows],
                 y=values,
                 mode='lines+markers',
                 name=f"{hg_key_name} - {continent}",
                 visible=False,  # Initially visible
                 line=dict(color=color_mapping[hg_key_name]),  # Wrap the color in a dict
                 marker = dict(symbol=symbol_mapping[hg_key_name])  # Add symbols here
-            )
-            fig.add_trace(trace)
-            traces.append(trace)
+            ))
 
     # Add "All" (sum across continents) trace per hypergiant
-    for hg_key, date_data in sums_by_hypergiant.items():
+    for hg_key, hg_dates, values in timeseries_arrays(sums_by_hypergiant, hypergiants):
         hg_key_name = key_name_mapping[hg_key]  # Get hypergiant name
-        dates = [date.replace('_', '-') for date in sorted(date_data.keys())]
-        values = [date_data[date] for date in sorted(date_data.keys())]
-
-        trace = go.Scatter(
-            x=dates,
+        traces.append(go.Scatter(
+            x=hg_dates,
             y=values,
             mode='lines+markers',
             name=f"{hg_key_name} - All",
             visible=True,
             line=dict(width=2, dash="dashdot", color = color_mapping[hg_key_name]),  # Emphasize "All" traces
             marker=dict(symbol=symbol_mapping[hg_key_name])  # Add symbols here
-        )
-        fig.add_trace(trace)
-        traces.append(trace)
+        ))
+    fig.add_traces(traces)
 
     # Add buttons for each continent
     for continent in all_continents:
@@ -857,31 +2727,22 @@ def analysis_country():
     )
 
     # Show the interactive plot
-    pio.write_html(fig, file="cdn_continent_evol_with_sum_by_hypergiant.html", auto_open=True)
+    write_report(fig, "cdn_continent_evol_with_sum_by_hypergiant.html", auto_open=True)
 
 def analysis_facility():
-    HYPERGIANTS_DIR = os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution')
-    final_dicts = load_json_file(os.path.join(HYPERGIANTS_DIR, f"final_dicts_{START_YEAR}_{END_YEAR}.json"))
-    final_dict_facilities = final_dicts['fac_count']
+    facilities = query_timeseries(load_rollups(), 'fac_count', freq=REPORT_FREQUENCY)
 
     # Prepare data for Plotly
     fig = go.Figure()
 
-    # Sort and process data
-    final_dict_facilities = dict(
-        reversed(sorted(
-            final_dict_facilities.items(),
-            key=lambda x: list(x[1].values())[-1] if x[1] else 0  # Get the value for the last day
-        ))
-    )
-
-    for hg_key, hg_data in final_dict_facilities.items():
+    # One trace per hypergiant, by decreasing number of facilities in the latest month
+    traces = []
+    for hg_key, dates, values in timeseries_arrays(facilities, hypergiants_by_latest(facilities)):
         hg_key = key_name_mapping[hg_key]  # Use the key name mapping for visualization
-        dates = [date.replace('_', '-') for date in hg_data.keys()]
-        values = list(hg_data.values())
         # Add a trace for each hypergiant
-        fig.add_trace(go.Scatter(x=dates, y=values, mode='lines+markers', name=hg_key,             line=dict(color=color_mapping[hg_key]),marker=dict(symbol=symbol_mapping[hg_key])  # Wrap the color in a dict
+        traces.append(go.Scatter(x=dates, y=values, mode='lines+markers', name=hg_key, line=dict(color=color_mapping[hg_key]),marker=dict(symbol=symbol_mapping[hg_key])  # Wrap the color in a dict
         ))
+    fig.add_traces(traces)
     # Update layout for better interactivity and readability
     fig.update_layout(
         title="Evolution of Number of Facilities",
@@ -894,7 +2755,7 @@ def analysis_facility():
     )
 
     # Show the interactive plot
-    pio.write_html(fig, file="cdn_facility_evol_timeseries.html", auto_open=True)
+    write_report(fig, "cdn_facility_evol_timeseries.html", auto_open=True)
     # fig.show()
 def getting_geo_coordinates(location_dict):
     coordinates_dict = {}
@@ -912,13 +2773,7 @@ def getting_geo_coordinates(location_dict):
         coordinates_dict[date] = coordinates
 
 def analysis_geographic_map():
-    # Prepare data
-    # HYPERGIANTS_DIR = os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution')
-    # final_dicts = load_json_file(os.path.join(HYPERGIANTS_DIR, f"final_dicts_{START_YEAR}_{END_YEAR}.json"))
-    # final_dicts_cities = final_dicts['cities_specific']
-    # plotly_data = prepare_plotly_data(key_name_mapping, final_dicts_cities, {})
-    # # # save plotly_data
-    # plotly_data.to_csv(os.path.join(HYPERGIANTS_DIR, f"plotly_data_{START_YEAR}_{END_YEAR}.csv"), index=False)
+    # Geocoded city data is produced by the 'geocode' pipeline stage
     plotly_data = pd.read_csv(
         os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', f"plotly_data_{START_YEAR}_{END_YEAR}.csv")
     )
@@ -957,33 +2812,24 @@ def analysis_geographic_map():
 
     # Show the figure
     # fig.show()
-    pio.write_html(fig, file="cdn_capacities_evol_map.html", auto_open=True)
+    write_report(fig, "cdn_capacities_evol_map.html", auto_open=True)
 
 
 def analysis_ixp_boxplot():
     HYPERGIANTS_DIR = os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution')
     final_dicts = load_json_file(os.path.join(HYPERGIANTS_DIR, f"final_dicts_{START_YEAR}_{END_YEAR}.json"))
-    final_dicts_capacities = final_dicts['capacities_ixp']
-    # Convert the final_dicts_capacities to a DataFrame
-    print(final_dicts_capacities)
-    records = []
-    for cdn, date_dict in final_dicts_capacities.items():
-        for date, ixps in date_dict.items():
-            for ixp_name, capacity in ixps.items():
-                # capacity should be numeric; if it's not, convert it as needed
-                records.append({
-                    "cdn": cdn,
-                    "date": date,
-                    "ixp_name": ixp_name,
-                    "capacity": float(capacity/1000)
-                })
-
-    long_form_data = pd.DataFrame(records)
-    long_form_data['cdn'] = long_form_data['cdn'].map(key_name_mapping)
-    long_form_data['date'] = long_form_data['date'].str.replace('_', '-')
 
-    # Convert 'date' to a proper datetime format
-    # long_form_data['date'] = pd.to_datetime(long_form_data['date'], format='%Y_%m')
+    # One row per (hypergiant, month, IXP), months in chronological order
+    capacities = metric_frame(final_dicts, 'capacities_ixp')
+    entries = capacities.assign(value=capacities['value'].map(lambda ixps: list(ixps.items()))).explode('value')
+    entries = entries.dropna(subset=['value'])
+    long_form_data = pd.DataFrame({
+        'cdn': entries['hypergiant'].map(key_name_mapping).to_numpy(),
+        'date': entries['period'].astype(str).to_numpy(),
+        'ixp_name': [ixp_name for ixp_name, _ in entries['value']],
+        'capacity': [float(capacity / 1000) for _, capacity in entries['value']],
+    })
+
     # Create the boxplot
     fig = px.box(
         long_form_data,
@@ -1062,12 +2908,723 @@ def analysis_ixp_boxplot():
     # fig.show()
 
     # Save the figure to an HTML file
-    pio.write_html(fig, file="ixp_capacities_by_cdn.html", auto_open=True)
+    write_report(fig, "ixp_capacities_by_cdn.html", auto_open=True)
+
+###############################################################################
+#                         LOCAL DASHBOARD SERVER
+###############################################################################
+
+DASHBOARD_HOST = '127.0.0.1'
+DASHBOARD_PORT = 8050
+# Hypergiants whose time series are fetched when a view opens; the others are only
+# listed in the legend and fetched when clicked
+DASHBOARD_INITIAL_TRACES = 5
+# Per-month views (see dashboard_month), next to the time series of ROLLUP_SCALAR_METRICS
+DASHBOARD_MONTH_VIEWS = ('continents', 'ixp_capacities')
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Hypergiants evolution</title>
+<script src="/plotly.js"></script>
+</head>
+<body style="font-family: Arial, sans-serif">
+<select id="view"></select>
+<select id="freq"></select>
+<input id="month" type="range" min="0" value="0" style="width: 40%">
+<span id="month-label"></span>
+<div id="plot" style="height: 85vh"></div>
+<script>
+let index;
+const cache = {};
+async function getJSON(path) {
+  if (!(path in cache)) cache[path] = fetch(path).then(response => response.json());
+  return cache[path];
+}
+function apiPath(...parts) { return '/api/' + [index.version, ...parts].map(encodeURIComponent).join('/'); }
+async function seriesTrace(metric, freq, hg, visible) {
+  const trace = {name: index.names[hg], meta: hg, mode: 'lines+markers', x: [], y: [],
+                 line: {color: index.colors[hg]}, visible: visible ? true : 'legendonly'};
+  if (visible) Object.assign(trace, await getJSON(apiPath('series', metric, freq, hg)));
+  return trace;
+}
+async function drawSeries(metric) {
+  const freq = document.getElementById('freq').value;
+  const traces = await Promise.all(index.hypergiants.map(
+    (hg, i) => seriesTrace(metric, freq, hg, i < index.initial_traces)));
+  await Plotly.react('plot', traces, {title: metric + ' (' + freq + ')', template: 'plotly_white',
+                                      hovermode: 'x unified', xaxis: {tickangle: 30}});
+}
+async function drawMonth(view) {
+  const month = index.months[document.getElementById('month').value];
+  document.getElementById('month-label').textContent = month;
+  const data = await getJSON(apiPath('month', view, month));
+  const hypergiants = index.hypergiants.filter(hg => hg in data);
+  let traces;
+  if (view === 'continents') {
+    const continents = [...new Set(hypergiants.flatMap(hg => Object.keys(data[hg])))].sort();
+    traces = continents.map(continent => ({type: 'bar', name: continent,
+      x: hypergiants.map(hg => index.names[hg]), y: hypergiants.map(hg => data[hg][continent] || 0)}));
+  } else {
+    traces = hypergiants.map(hg => ({type: 'box', boxpoints: 'all', name: index.names[hg],
+      marker: {color: index.colors[hg]}, y: Object.values(data[hg]).map(speed => speed / 1000),
+      text: Object.keys(data[hg])}));
+  }
+  await Plotly.react('plot', traces, {title: view + ' in ' + month, template: 'plotly_white',
+                                      barmode: 'stack', showlegend: view === 'continents'});
+}
+function draw() {
+  const view = document.getElementById('view').value;
+  const monthView = index.month_views.includes(view);
+  document.getElementById('freq').style.display = monthView ? 'none' : '';
+  document.getElementById('month').style.display = monthView ? '' : 'none';
+  document.getElementById('month-label').style.display = monthView ? '' : 'none';
+  return monthView ? drawMonth(view) : drawSeries(view);
+}
+async function init() {
+  index = await getJSON('/api/index');
+  const fill = (id, values) => document.getElementById(id).innerHTML =
+    values.map(value => '<option>' + value + '</option>').join('');
+  fill('view', index.series.concat(index.month_views));
+  fill('freq', index.frequencies);
+  const slider = document.getElementById('month');
+  slider.max = index.months.length - 1;
+  slider.value = index.months.length - 1;
+  ['view', 'freq', 'month'].forEach(id => document.getElementById(id).addEventListener('change', draw));
+  await draw();
+  // Hidden hypergiants are fetched the first time they are shown
+  document.getElementById('plot').on('plotly_legendclick', event => {
+    const trace = event.data[event.curveNumber];
+    const view = document.getElementById('view').value;
+    if (index.month_views.includes(view) || trace.x.length) return true;
+    getJSON(apiPath('series', view, document.getElementById('freq').value, trace.meta)).then(
+      series => Plotly.restyle('plot', {x: [series.x], y: [series.y], visible: true}, [event.curveNumber]));
+    return false;
+  });
+}
+init();
+</script>
+</body>
+</html>
+"""
+
+def dashboard_index(final_dicts: dict, rollups: dict, version: str) -> dict:
+    """
+    What the dashboard page needs to start: the snapshots, the hypergiants (by decreasing
+    number of facilities at the latest snapshot), their display names and colors, and the
+    available views and frequencies. No per-month data is included.
+    """
+    hypergiants = hypergiants_by_latest(query_timeseries(rollups, 'fac_count'))
+    names = {hg_key: key_name_mapping.get(hg_key, hg_key) for hg_key in hypergiants}
+    return {
+        'version': version,
+        'months': sorted({key for per_snapshot in final_dicts['fac_count'].values() for key in per_snapshot}),
+        'hypergiants': hypergiants,
+        'names': names,
+        'colors': {hg_key: color_mapping.get(name) for hg_key, name in names.items()},
+        'series': list(ROLLUP_SCALAR_METRICS),
+        'frequencies': list(rollups),
+        'month_views': list(DASHBOARD_MONTH_VIEWS),
+        'initial_traces': DASHBOARD_INITIAL_TRACES,
+    }
+
+def dashboard_series(series_frame: pd.DataFrame, hypergiant: str) -> dict:
+    """
+    {'x': periods, 'y': values} of one hypergiant in a query_timeseries frame.
+    """
+    values = series_frame[hypergiant].dropna()
+    return {'x': values.index.astype(str).tolist(), 'y': values.tolist()}
+
+def dashboard_month(final_dicts: dict, view: str, month: str) -> dict:
+    """
+    Data of a per-month view (see DASHBOARD_MONTH_VIEWS) for one snapshot, per hypergiant:
+      - 'continents': number of countries per continent
+      - 'ixp_capacities': capacity per IXP
+    """
+    if view == 'continents':
+        return {hg_key: dict(pd.Series([get_continent_from_iso2(c) for c in per_snapshot[month]],
+                                       dtype=object).value_counts())
+                for hg_key, per_snapshot in final_dicts['countries_specific'].items() if month in per_snapshot}
+    if view == 'ixp_capacities':
+        return {hg_key: per_snapshot[month]
+                for hg_key, per_snapshot in final_dicts['capacities_ixp'].items() if month in per_snapshot}
+    raise KeyError(view)
+
+class DashboardRequestHandler(BaseHTTPRequestHandler):
+    """
+    Serve the dashboard page, plotly.js and its JSON API:
+      /api/index                                  dashboard_index (revalidated on each load)
+      /api/<version>/series/<metric>/<freq>/<hg>  one time series (see query_timeseries)
+      /api/<version>/month/<view>/<YYYY_MM>       one per-month view (see dashboard_month)
+    Versioned URLs never change content and are cached by the browser for good; every
+    response carries an ETag so that revalidations are answered with 304 Not Modified.
+    """
+    # Set by serve_dashboard: loaded data, version and the encoded responses already served
+    state = None
+
+    def do_GET(self):
+        state = self.state
+        parts = [urllib.parse.unquote(part) for part in urllib.parse.urlsplit(self.path).path.strip('/').split('/')]
+        immutable = 'public, max-age=31536000, immutable'
+        try:
+            if parts == ['']:
+                self.send_body(DASHBOARD_HTML.encode(), 'text/html; charset=utf-8', 'no-cache')
+            elif parts == ['plotly.js']:
+                self.send_body(state['plotlyjs'], 'application/javascript', immutable)
+            elif parts == ['api', 'index']:
+                self.send_body(state['index'], 'application/json', 'no-cache')
+            elif len(parts) == 6 and parts[:3] == ['api', state['version'], 'series']:
+                metric, freq, hypergiant = parts[3:]
+                frame_key = (metric, freq)
+                if frame_key not in state['frames']:
+                    state['frames'][frame_key] = query_timeseries(state['rollups'], metric, freq=freq)
+                self.send_json(dashboard_series(state['frames'][frame_key], hypergiant), immutable)
+            elif len(parts) == 5 and parts[:3] == ['api', state['version'], 'month']:
+                self.send_json(dashboard_month(state['final_dicts'], parts[3], parts[4]), immutable)
+            else:
+                self.send_error(404)
+        except (KeyError, ValueError):
+            self.send_error(404)
+
+    def send_json(self, payload, cache_control: str) -> None:
+        """
+        Send a JSON payload, encoded once per URL.
+        """
+        if self.path not in self.state['responses']:
+            self.state['responses'][self.path] = json.dumps(payload, cls=NpEncoder).encode()
+        self.send_body(self.state['responses'][self.path], 'application/json', cache_control)
+
+    def send_body(self, body: bytes, content_type: str, cache_control: str) -> None:
+        """
+        Send a response with ETag/Cache-Control headers (304 if the client already has it),
+        gzip-compressed when the client accepts it.
+        """
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.end_headers()
+            return
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > 1024
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+def dashboard_server(host: str = None, port: int = None) -> ThreadingHTTPServer:
+    """
+    Load the aggregate stage's outputs once and return an HTTP server for the dashboard
+    (see DashboardRequestHandler), bound to localhost by default.
+    """
+    from plotly.offline import get_plotlyjs
+    final_dicts_path = hypergiants_evolution_path(f'final_dicts_{START_YEAR}_{END_YEAR}.json')
+    rollups_path = hypergiants_evolution_path(f'rollups_{START_YEAR}_{END_YEAR}.json')
+    # Changes whenever the data is re-aggregated, so versioned URLs can be cached forever
+    version = hashlib.blake2b(json.dumps([file_signature(final_dicts_path), file_signature(rollups_path)]).encode(),
+                              digest_size=8).hexdigest()
+    final_dicts = load_json_file(final_dicts_path)
+    rollups = load_json_file(rollups_path)
+    DashboardRequestHandler.state = {
+        'final_dicts': final_dicts,
+        'rollups': rollups,
+        'version': version,
+        'index': json.dumps(dashboard_index(final_dicts, rollups, version), cls=NpEncoder).encode(),
+        'plotlyjs': get_plotlyjs().encode(),
+        'frames': {},
+        'responses': {},
+    }
+    return ThreadingHTTPServer((host or DASHBOARD_HOST, port or DASHBOARD_PORT), DashboardRequestHandler)
+
+def serve_dashboard(host: str = None, port: int = None) -> None:
+    """
+    Serve the dashboard until interrupted (Ctrl+C).
+    """
+    server = dashboard_server(host, port)
+    print(f"Dashboard on http://{server.server_address[0]}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+###############################################################################
+#                       PIPELINE STAGES & CONFIGURATION
+###############################################################################
+
+# Keys accepted in the JSON configuration file, and the module setting each one overrides
+CONFIG_KEYS = {
+    'data_directory': 'DATA_DIRECTORY',
+    'hypergiants_path': 'HYPERGIANTS_PATH',
+    'peeringdb_data_directory': 'PEERINGDB_DATA_DIRECTORY',
+    'report_directory': 'REPORT_DIRECTORY',
+    'report_frequency': 'REPORT_FREQUENCY',
+    'report_workers': 'REPORT_WORKERS',
+    'focus_hypergiants': 'FOCUS_HYPERGIANTS',
+    'start_year': 'START_YEAR',
+    'end_year': 'END_YEAR',
+    'snapshot_cadence': 'SNAPSHOT_CADENCE',
+    'skip_unchanged_snapshots': 'SKIP_UNCHANGED_SNAPSHOTS',
+    'decompress_threads': 'DECOMPRESS_THREADS',
+    'prefetch_depth': 'PREFETCH_DEPTH',
+    'prefetch_memory_cap_mb': 'PREFETCH_MEMORY_CAP_MB',
+    'aggregation_backend': 'AGGREGATION_BACKEND',
+    'network_aggregation_backend': 'NETWORK_AGGREGATION_BACKEND',
+    'network_partitions': 'NETWORK_PARTITIONS',
+    'dashboard_host': 'DASHBOARD_HOST',
+    'dashboard_port': 'DASHBOARD_PORT',
+}
+# Configuration file used when --config is not given
+CONFIG_ENV_VARIABLE = 'HYPERGIANTS_EVOLUTION_CONFIG'
+
+def load_config(config_path: str) -> dict:
+    """
+    Load a JSON configuration file (see CONFIG_KEYS) and apply it to the module settings,
+    replacing the hardcoded defaults at the top of this file.
+    """
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    unknown = set(config) - set(CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown configuration keys in {config_path}: {sorted(unknown)}")
+    for key, value in config.items():
+        globals()[CONFIG_KEYS[key]] = value
+    return config
+
+def hypergiants_evolution_path(file_name: str) -> str:
+    """
+    Path of an artifact in the Hypergiants_evolution output directory.
+    """
+    return os.path.join(DATA_DIRECTORY, 'Hypergiants_evolution', file_name)
+
+def asn_country_path() -> str:
+    """
+    Path of the ASN -> country file read by study_cdn_evolution.
+    """
+    return os.path.join(os.path.dirname(DATA_DIRECTORY), "BGP_data", "ASNS-2023-05-12.json")
+
+def selected_peeringdb_snapshots(skip_unchanged: bool = None) -> list:
+    """
+    The snapshots of PEERINGDB_DATA_DIRECTORY covered by the current configuration.
+    `skip_unchanged` defaults to SKIP_UNCHANGED_SNAPSHOTS; stage fingerprints pass False so
+    that checking whether a stage is up to date never reads the dumps themselves.
+    """
+    return select_snapshots(scan_peeringdb_snapshots(PEERINGDB_DATA_DIRECTORY),
+                            cadence=SNAPSHOT_CADENCE,
+                            start_date=datetime.date(START_YEAR, 1, 1),
+                            end_date=datetime.date(END_YEAR, 12, 31),
+                            skip_unchanged=SKIP_UNCHANGED_SNAPSHOTS if skip_unchanged is None else skip_unchanged)
+
+def file_signature(file_path: str) -> list:
+    """
+    Cheap identity of an input file (size and modification time), None if it does not exist.
+    """
+    if not os.path.exists(file_path):
+        return None
+    stat = os.stat(file_path)
+    return [os.path.basename(file_path), stat.st_size, stat.st_mtime_ns]
+
+def stage_parse() -> None:
+    """
+    Parse the selected PeeringDB dumps into the delta snapshot store.
+    The store is kept up to the first snapshot whose date or dump changed, and rebuilt from there.
+    """
+    snapshots = selected_peeringdb_snapshots()
+    store_directory = hypergiants_evolution_path('snapshot_store')
+    build_snapshot_store(snapshots, store_directory)
+
+def stage_aggregate() -> None:
+    """
+    Compute the per-hypergiant metrics (final_dicts) from the snapshot store.
+    HYPERGIANTS_PATH is a hypergiant list or a directory of dated lists (see
+    load_hypergiant_intervals). The membership used is saved next to the results, so that
+    when only the lists change (or snapshots are appended) the next run reuses the previous
+    results and only recomputes the affected hypergiants from the affected snapshots on.
+    """
+    store_directory = hypergiants_evolution_path('snapshot_store')
+    output_path = hypergiants_evolution_path(f'final_dicts_{START_YEAR}_{END_YEAR}.json')
+    meta_path = hypergiants_evolution_path(f'final_dicts_{START_YEAR}_{END_YEAR}.meta.json')
+    events_path = hypergiants_evolution_path(f'change_events_{START_YEAR}_{END_YEAR}.jsonl')
+    intervals = load_hypergiant_intervals(HYPERGIANTS_PATH, FOCUS_HYPERGIANTS)
+    by_day = SNAPSHOT_CADENCE not in ('monthly', 'first-of-month')
+    store_index = read_snapshot_store_index(store_directory, with_signatures=True)
+    meta = {
+        'code': code_fingerprint([process_data_from_store, save_change_events, load_change_events]),
+        'by_day': by_day,
+        'store_index': store_index,
+        'hypergiants': intervals_to_records(intervals),
+    }
+
+    previous = None
+    if all(os.path.exists(file_path) for file_path in (meta_path, output_path, events_path)):
+        with open(meta_path, 'r') as f:
+            previous_meta = json.load(f)
+        # Only the snapshots up to the first one whose date or dump changed are covered
+        covered = 0
+        for previous_entry, entry in zip(previous_meta.get('store_index', []), store_index):
+            if previous_entry != entry or entry[1] is None:
+                break
+            covered += 1
+        if previous_meta['code'] == meta['code'] and previous_meta['by_day'] == by_day and covered:
+            cadence = 'daily' if by_day else 'first-of-month'
+            previous = {'final_dicts': dict(load_json_file(output_path), events=load_change_events(events_path)),
+                        'hypergiants': intervals_from_records(previous_meta['hypergiants']),
+                        'keys': [snapshot_key(datetime.date.fromisoformat(iso_date), cadence)
+                                 for iso_date, _ in store_index[:covered]]}
+
+    final_dicts = process_data_from_store(store_directory, intervals, by_day=by_day, previous=previous)
+    # The change events are saved as a separate stream, loadable without the per-month lists
+    save_change_events(final_dicts.pop('events'), events_path)
+    del final_dicts['footprints']
+    with open(output_path, 'w') as f:
+        json.dump(final_dicts, f, cls=NpEncoder)
+    with open(hypergiants_evolution_path(f'rollups_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
+        json.dump(build_rollups(final_dicts), f, cls=NpEncoder)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, cls=NpEncoder)
+
+def stage_enrich() -> None:
+    """
+    Map content networks to countries (study_cdn_evolution) and save the per-country results.
+    """
+    # The most recent hypergiant list, when HYPERGIANTS_PATH is a directory of dated lists
+    hypergiants_dict = load_hypergiants(hypergiant_list_files(HYPERGIANTS_PATH)[-1][1], FOCUS_HYPERGIANTS)
+    cdn_per_country, cdn_traffic_per_country = study_cdn_evolution(START_YEAR, END_YEAR, hypergiants_dict,
+                                                                   peeringdb_data_directory=PEERINGDB_DATA_DIRECTORY,
+                                                                   data_directory=DATA_DIRECTORY)
+    with open(hypergiants_evolution_path(f'cdn_per_country_{START_YEAR}_{END_YEAR}.json'), 'w') as f:
+        json.dump({'cdn_per_country': cdn_per_country, 'cdn_traffic_per_country': cdn_traffic_per_country},
+                  f, cls=NpEncoder)
+
+def stage_geocode() -> None:
+    """
+    Geocode the cities of every hypergiant for the map report. Coordinates are cached
+    across runs so that only new cities are sent to the geocoder.
+    """
+    final_dicts = load_json_file(hypergiants_evolution_path(f'final_dicts_{START_YEAR}_{END_YEAR}.json'))
+    cache_path = hypergiants_evolution_path('geocode_cache.json')
+    coordinates_city = load_json_file(cache_path) if os.path.exists(cache_path) else {}
+    mapping_name = {key: name for key, name in key_name_mapping.items() if key in final_dicts['cities_specific']}
+    plotly_data = prepare_plotly_data(mapping_name, final_dicts['cities_specific'], coordinates_city)
+    plotly_data.to_csv(hypergiants_evolution_path(f"plotly_data_{START_YEAR}_{END_YEAR}.csv"), index=False)
+    with open(cache_path, 'w') as f:
+        json.dump(coordinates_city, f)
+
+def stage_networks() -> None:
+    """
+    Compute the process_hypergiant metrics of every network in PeeringDB (see process_all_networks).
+    """
+    output_directory = hypergiants_evolution_path('networks')
+    os.makedirs(output_directory, exist_ok=True)
+    process_all_networks(START_YEAR, END_YEAR, PEERINGDB_DATA_DIRECTORY, output_directory)
+
+def stage_sql() -> None:
+    """
+    Export the snapshot store as partitioned Parquet files for query_peeringdb.
+    """
+    export_snapshot_store_to_parquet(hypergiants_evolution_path('snapshot_store'), hypergiants_evolution_path('parquet'))
+
+# Declarative stage graph, in dependency order. For each stage:
+#   deps    - upstream stages
+#   run     - function producing the outputs
+#   outputs - artifacts the stage must leave on disk
+#   inputs  - fingerprint of the raw inputs read by the stage (beyond upstream artifacts)
+#   params  - module settings the stage depends on
+# The code part of each fingerprint covers `run` and everything it calls (see code_fingerprint).
+#   batch   - (optional) rendered after the other stages, concurrently (see render_reports)
+PIPELINE_STAGES = {
+    'parse': {
+        'deps': [],
+        'run': stage_parse,
+        'outputs': lambda: [os.path.join(hypergiants_evolution_path('snapshot_store'), 'index.json')],
+        'inputs': lambda: [[d.isoformat(), file_signature(path)]
+                           for d, path in selected_peeringdb_snapshots(skip_unchanged=False)],
+        'params': ['START_YEAR', 'END_YEAR', 'SNAPSHOT_CADENCE', 'SKIP_UNCHANGED_SNAPSHOTS'],
+    },
+    'aggregate': {
+        'deps': ['parse'],
+        'run': stage_aggregate,
+        'outputs': lambda: [hypergiants_evolution_path(f'final_dicts_{START_YEAR}_{END_YEAR}.json'),
+                            hypergiants_evolution_path(f'change_events_{START_YEAR}_{END_YEAR}.jsonl'),
+                            hypergiants_evolution_path(f'rollups_{START_YEAR}_{END_YEAR}.json')],
+        'inputs': lambda: [file_signature(file_path) for _, file_path in hypergiant_list_files(HYPERGIANTS_PATH)],
+        'params': ['FOCUS_HYPERGIANTS', 'AGGREGATION_BACKEND'],
+    },
+    'enrich': {
+        'deps': ['parse'],
+        'run': stage_enrich,
+        'outputs': lambda: [hypergiants_evolution_path(f'cdn_per_country_{START_YEAR}_{END_YEAR}.json')],
+        'inputs': lambda: [file_signature(asn_country_path())],
+        'params': [],
+    },
+    'networks': {
+        'deps': [],
+        'run': stage_networks,
+        'outputs': lambda: [os.path.join(hypergiants_evolution_path('networks'), 'network_partitions.json')],
+        'inputs': lambda: [[d.isoformat(), file_signature(path)]
+                           for d, path in selected_peeringdb_snapshots(skip_unchanged=False)],
+        'params': ['START_YEAR', 'END_YEAR', 'SNAPSHOT_CADENCE', 'SKIP_UNCHANGED_SNAPSHOTS',
+                   'NETWORK_AGGREGATION_BACKEND', 'NETWORK_PARTITIONS'],
+    },
+    'sql': {
+        'deps': ['parse'],
+        'run': stage_sql,
+        'outputs': lambda: [os.path.join(hypergiants_evolution_path('parquet'), table) for table in PEERINGDB_TABLES],
+        'params': [],
+    },
+    'geocode': {
+        'deps': ['aggregate'],
+        'run': stage_geocode,
+        'outputs': lambda: [hypergiants_evolution_path(f"plotly_data_{START_YEAR}_{END_YEAR}.csv")],
+        'params': [],
+    },
+    'report_city': {
+        'deps': ['aggregate'],
+        'batch': True,
+        'run': analysis_city,
+        'outputs': lambda: [os.path.join(REPORT_DIRECTORY, "cdn_city_evol_timeseries.html")],
+        'params': ['REPORT_FREQUENCY'],
+    },
+    'report_country': {
+        'deps': ['aggregate'],
+        'batch': True,
+        'run': analysis_country,
+        'outputs': lambda: [os.path.join(REPORT_DIRECTORY, "cdn_continent_evol_with_sum_by_hypergiant.html")],
+        'params': [],
+    },
+    'report_facility': {
+        'deps': ['aggregate'],
+        'batch': True,
+        'run': analysis_facility,
+        'outputs': lambda: [os.path.join(REPORT_DIRECTORY, "cdn_facility_evol_timeseries.html")],
+        'params': ['REPORT_FREQUENCY'],
+    },
+    'report_map': {
+        'deps': ['geocode'],
+        'batch': True,
+        'run': analysis_geographic_map,
+        'outputs': lambda: [os.path.join(REPORT_DIRECTORY, "cdn_capacities_evol_map.html")],
+        'params': [],
+    },
+    'report_ixp': {
+        'deps': ['aggregate'],
+        'batch': True,
+        'run': analysis_ixp_boxplot,
+        'outputs': lambda: [os.path.join(REPORT_DIRECTORY, "ixp_capacities_by_cdn.html")],
+        'params': [],
+    },
+}
+# Stage groups usable on the command line
+STAGE_ALIASES = {
+    'report': [name for name in PIPELINE_STAGES if name.startswith('report_')],
+    'all': list(PIPELINE_STAGES),
+}
+
+def code_dependencies(functions: list) -> Tuple[list, dict]:
+    """
+    The functions and classes of this module reachable from `functions` through the global
+    names their code refers to (including nested functions, lambdas and methods), and the
+    module constants read along the way ({name: value}, JSON-serializable ones only).
+    """
+    module_globals = globals()
+    reached, constants = {}, {}
+    pending = list(functions)
+    while pending:
+        obj = pending.pop()
+        if obj.__qualname__ in reached:
+            continue
+        reached[obj.__qualname__] = obj
+        codes = ([obj.__code__] if inspect.isfunction(obj)
+                 else [member.__code__ for member in vars(obj).values() if inspect.isfunction(member)])
+        while codes:
+            code = codes.pop()
+            codes.extend(const for const in code.co_consts if inspect.iscode(const))
+            for name in code.co_names:
+                if name not in module_globals:
+                    continue
+                value = module_globals[name]
+                if inspect.isfunction(value) or inspect.isclass(value):
+                    if value.__module__ == obj.__module__:
+                        pending.append(value)
+                elif not callable(value) and not inspect.ismodule(value):
+                    constants[name] = value
+    return [reached[name] for name in sorted(reached)], constants
+
+def code_fingerprint(functions: list) -> str:
+    """
+    Hash of the source of `functions` and of everything they call in this module (see
+    code_dependencies), so that editing any helper invalidates the results computed with it.
+    """
+    def encode_set(obj):
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj, key=repr)
+        return NpEncoder().default(obj)
+
+    dependencies, constants = code_dependencies(functions)
+    payload = [inspect.getsource(function) for function in dependencies]
+    for name in sorted(constants):
+        try:
+            payload.append(f"{name}={json.dumps(constants[name], sort_keys=True, default=encode_set)}")
+        except (TypeError, ValueError):
+            continue  # Not plain data (e.g. a client object), left out
+    return hashlib.sha256('\n'.join(payload).encode()).hexdigest()
+
+def stage_fingerprint(name: str, fingerprints: dict) -> str:
+    """
+    Fingerprint of a stage: its parameters, the source of its code, its raw inputs and the
+    fingerprints of its upstream stages (given in `fingerprints`).
+    """
+    stage = PIPELINE_STAGES[name]
+    payload = {
+        'params': {param: globals()[param] for param in stage['params']},
+        'code': code_fingerprint([stage['run']]),
+        'inputs': stage['inputs']() if 'inputs' in stage else None,
+        'deps': [fingerprints[dep] for dep in stage['deps']],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, cls=NpEncoder).encode()).hexdigest()
+
+def resolve_stages(targets: list) -> list:
+    """
+    Expand aliases and add upstream dependencies; returns stage names in execution order.
+    """
+    needed = set()
+    pending = [stage for target in targets for stage in STAGE_ALIASES.get(target, [target])]
+    while pending:
+        name = pending.pop()
+        if name not in PIPELINE_STAGES:
+            raise ValueError(f"Unknown stage {name!r}, expected one of {list(PIPELINE_STAGES) + list(STAGE_ALIASES)}")
+        if name not in needed:
+            needed.add(name)
+            pending.extend(PIPELINE_STAGES[name]['deps'])
+    return [name for name in PIPELINE_STAGES if name in needed]
+
+def render_report(name: str, settings: dict) -> dict:
+    """
+    Run one report stage in a worker process: apply the parent's `settings` (module
+    settings of CONFIG_KEYS), render with auto-open disabled, and return its render time
+    and the size of its outputs.
+    """
+    globals().update(settings, REPORT_AUTO_OPEN=False)
+    start = time.time()
+    PIPELINE_STAGES[name]['run']()
+    outputs = PIPELINE_STAGES[name]['outputs']()
+    return {'stage': name, 'seconds': time.time() - start,
+            'bytes': sum(os.path.getsize(output) for output in outputs if os.path.exists(output))}
+
+def render_reports(names: list = None, workers: int = None):
+    """
+    Render report stages (default: all) concurrently in a process pool of `workers`
+    processes (default: REPORT_WORKERS, else one per report up to the CPU count), so that
+    the batch takes about as long as the slowest figure. The shared plotly.js bundle is
+    written first. Yields each stage's render time and output size as it completes; if
+    some reports fail, the others are still rendered and a RuntimeError is raised at the end.
+    """
+    names = names or STAGE_ALIASES['report']
+    workers = workers or REPORT_WORKERS or min(len(names), os.cpu_count() or 1)
+    settings = {setting: globals()[setting] for setting in CONFIG_KEYS.values()}
+    write_plotlyjs_bundle(REPORT_DIRECTORY)
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_report, name, settings): name for name in names}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as error:
+                print(f"[FAILED] {futures[future]}: {error!r}")
+                failed.append(futures[future])
+                continue
+            print(f"[DONE] {result['stage']} in {result['seconds']:.1f}s ({result['bytes'] / 1e6:.2f} MB)")
+            yield result
+    if failed:
+        raise RuntimeError(f"Reports failed: {', '.join(failed)}")
+
+def run_pipeline(targets: list = None, force: bool = False, dry_run: bool = False) -> dict:
+    """
+    Run the requested stages (default: all) and their dependencies. A stage is skipped
+    when its fingerprint matches the one recorded at its last successful run and its
+    outputs still exist. `force` re-runs the requested stages (not their dependencies).
+    Stale batch stages (the reports) are rendered last, concurrently (see render_reports).
+    Returns {stage: 'run' | 'skip' | 'stale'} ('stale' only in dry runs).
+    """
+    targets = targets or ['all']
+    # Only the explicitly requested stages are forced, not what they depend on
+    forced = {stage for target in targets for stage in STAGE_ALIASES.get(target, [target])} if force else set()
+
+    fingerprints_path = hypergiants_evolution_path('stage_fingerprints.json')
+    recorded = load_json_file(fingerprints_path) if os.path.exists(fingerprints_path) else {}
+    os.makedirs(os.path.dirname(fingerprints_path), exist_ok=True)
+
+    fingerprints = {}
+    status = {}
+    batch = []
+    for name in resolve_stages(targets):
+        stage = PIPELINE_STAGES[name]
+        fingerprints[name] = stage_fingerprint(name, fingerprints)
+        up_to_date = (recorded.get(name) == fingerprints[name]
+                      and all(os.path.exists(output) for output in stage['outputs']()))
+        if up_to_date and name not in forced:
+            print(f"[SKIP] {name} is up to date")
+            status[name] = 'skip'
+            continue
+        if dry_run:
+            print(f"[STALE] {name}")
+            status[name] = 'stale'
+            continue
+
+        print(f"[RUN] {name}")
+        if stage.get('batch'):
+            batch.append(name)
+            continue
+        start = time.time()
+        stage['run']()
+        recorded[name] = fingerprints[name]
+        with open(fingerprints_path, 'w') as f:
+            json.dump(recorded, f, indent=2)
+        print(f"[DONE] {name} in {time.time() - start:.1f}s")
+        status[name] = 'run'
+
+    if batch:
+        for result in render_reports(batch):
+            recorded[result['stage']] = fingerprints[result['stage']]
+            with open(fingerprints_path, 'w') as f:
+                json.dump(recorded, f, indent=2)
+            status[result['stage']] = 'run'
+    return status
+
+###############################################################################
+#                                   MAIN
+###############################################################################
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Study the evolution of hypergiants in PeeringDB.")
+    parser.add_argument('stages', nargs='*',
+                        help=f"Stages to bring up to date: {', '.join(list(PIPELINE_STAGES) + list(STAGE_ALIASES))} "
+                             f"(default: all, or aggregate with --serve)")
+    parser.add_argument('--config', default=os.environ.get(CONFIG_ENV_VARIABLE),
+                        help=f"JSON configuration file (default: ${CONFIG_ENV_VARIABLE})")
+    parser.add_argument('--force', action='store_true', help="Re-run the requested stages even if up to date")
+    parser.add_argument('--dry-run', action='store_true', help="Only report which stages are stale")
+    parser.add_argument('--serve', action='store_true',
+                        help="Then serve the interactive dashboard on localhost (see serve_dashboard)")
+    parser.add_argument('--port', type=int, help=f"Dashboard port (default: {DASHBOARD_PORT})")
+    args = parser.parse_args(argv)
+
+    if args.config:
+        load_config(args.config)
+    stages = args.stages or (['aggregate'] if args.serve else ['all'])
+    run_pipeline(stages, force=args.force, dry_run=args.dry_run)
+    if args.serve and not args.dry_run:
+        serve_dashboard(port=args.port)
 
 if __name__ == "__main__":
-    # main()
-    analysis_city()
-    analysis_country()
-    analysis_facility()
-    analysis_geographic_map()
-    analysis_ixp_boxplot()
\ No newline at end of file
+    main()